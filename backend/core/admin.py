@@ -1,12 +1,15 @@
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
 from django.utils.crypto import get_random_string
+from django.utils.html import format_html
 from django.contrib import admin
 from django import forms
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import path, reverse
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.core.exceptions import PermissionDenied
 from django.contrib import messages
+from django.db.models import Exists, OuterRef, Prefetch
 import pandas as pd
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
@@ -14,7 +17,11 @@ from io import BytesIO
 from django.contrib.auth.hashers import make_password
 import datetime
 
-from .models import Student, Department, Class, Subject, Teacher, User
+from .models import Student, Department, Class, Subject, Teacher, User, Job, JobResult
+from .jobs import background_action, report_progress
+from .importers import StudentImporter
+from . import exports, pdf
+from .promotion import PromotionPlan
 
 class ImportExcelForm(forms.Form):
     excel_file = forms.FileField(
@@ -80,13 +87,16 @@ class StudentAdmin(admin.ModelAdmin):
         return custom_urls + urls
     
     # 1. Bulk Send WhatsApp Notifications to Parents/Guardians
+    @background_action
     def bulk_send_whatsapp_notifications(self, request, queryset):
         if request.method == 'POST':
             message = request.POST.get('message', '')
             sent_count = 0
             failed_count = 0
             
-            for student in queryset:
+            total = len(queryset)
+            for done, student in enumerate(queryset, 1):
+                report_progress(request, done, total)
                 if student.parent_guardian_contact:
                     try:
                         # WhatsApp integration placeholder
@@ -127,135 +137,17 @@ class StudentAdmin(admin.ModelAdmin):
         return None
     
     # 2. Generate Individual Student Profile Reports
+    @background_action
     def generate_individual_student_profile_reports(self, request, queryset):
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        
-        for student in queryset:
-            # Start new page for each student
-            p.setFont("Helvetica-Bold", 16)
-            p.drawString(100, 750, f"Student Profile Report")
-            
-            # Student ID and Basic Info
-            p.setFont("Helvetica", 12)
-            y_position = 700
-            p.drawString(100, y_position, f"Student ID: {student.student_id}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Full Name: {student.full_name}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Date of Birth: {student.date_of_birth}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Admission Date: {student.date_of_admission}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Current Class: {student.current_class}")
-            
-            # Parent/Guardian Information
-            y_position -= 40
-            p.setFont("Helvetica-Bold", 14)
-            p.drawString(100, y_position, "Parent/Guardian Information:")
-            y_position -= 20
-            p.setFont("Helvetica", 12)
-            p.drawString(100, y_position, f"Name: {student.parent_guardian_name}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Contact: {student.parent_guardian_contact}")
-            
-            # Address
-            y_position -= 40
-            p.setFont("Helvetica-Bold", 14)
-            p.drawString(100, y_position, "Address:")
-            y_position -= 20
-            p.setFont("Helvetica", 12)
-            # Wrap address text
-            address_lines = self._wrap_text(student.address, 60)
-            for line in address_lines:
-                if y_position < 50:
-                    p.showPage()
-                    p.setFont("Helvetica", 12)
-                    y_position = 750
-                p.drawString(100, y_position, line)
-                y_position -= 15
-            
-            # Add a separator between students
-            if queryset.count() > 1 and student != queryset.last():
-                p.showPage()
-                p.setFont("Helvetica", 12)
-        
-        p.save()
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="student_profiles.pdf"'
-        return response
+        return pdf.render_pdf('student_profile', pdf.student_rows(queryset), 'student_profiles.pdf')
     
     generate_individual_student_profile_reports.short_description = "📄 Generate individual student profile reports"
     
-    # Helper method for text wrapping
-    def _wrap_text(self, text, max_length):
-        if not text:
-            return ['']
-        words = text.split()
-        lines = []
-        current_line = []
-        current_length = 0
-        
-        for word in words:
-            if current_length + len(word) + 1 <= max_length:
-                current_line.append(word)
-                current_length += len(word) + 1
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-                current_length = len(word)
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        return lines
-    
     # 3. Export Student Data to Excel
+    @background_action
     def export_student_data_to_excel(self, request, queryset):
-        import openpyxl
-        from openpyxl.utils import get_column_letter
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Students Data"
-        
-        # Headers - REMOVED 'Status' column
-        headers = [
-            'Student ID', 'Full Name', 'Date of Birth', 'Date of Admission',
-            'Current Class', 'Parent/Guardian Name', 'Parent/Guardian Contact',
-            'Address', 'Email', 'Username'
-        ]
-        
-        for col_num, header in enumerate(headers, 1):
-            col_letter = get_column_letter(col_num)
-            ws[f'{col_letter}1'] = header
-            ws.column_dimensions[col_letter].width = 20
-        
-        # Data rows - REMOVED status field
-        for row_num, student in enumerate(queryset, 2):
-            ws[f'A{row_num}'] = student.student_id
-            ws[f'B{row_num}'] = student.full_name
-            ws[f'C{row_num}'] = str(student.date_of_birth) if student.date_of_birth else ''
-            ws[f'D{row_num}'] = str(student.date_of_admission) if student.date_of_admission else ''
-            ws[f'E{row_num}'] = str(student.current_class) if student.current_class else ''
-            ws[f'F{row_num}'] = student.parent_guardian_name
-            ws[f'G{row_num}'] = student.parent_guardian_contact
-            ws[f'H{row_num}'] = student.address
-            ws[f'I{row_num}'] = student.user.email if student.user else ''
-            ws[f'J{row_num}'] = student.user.username if student.user else ''
-        
-        # Save to response
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        response = HttpResponse(
-            buffer,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="students_export.xlsx"'
-        return response
+        rows = exports.student_rows(queryset)
+        return exports.stream_xlsx('students_export.xlsx', 'Students Data', exports.STUDENT_HEADERS, rows)
     
     export_student_data_to_excel.short_description = "📊 Export student data to Excel"
     
@@ -292,49 +184,9 @@ class StudentAdmin(admin.ModelAdmin):
     bulk_update_student_contact_information.short_description = "📝 Bulk update student contact information"
     
     # 5. Generate Student ID Cards
+    @background_action
     def generate_student_id_cards(self, request, queryset):
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=(300, 200))  # ID card size
-        
-        for student in queryset:
-            # ID Card Border
-            p.setStrokeColorRGB(0, 0, 0)  # Black border
-            p.rect(10, 10, 280, 180)
-            
-            # School Name
-            p.setFont("Helvetica-Bold", 14)
-            p.drawString(50, 160, "New Hope College")
-            
-            # Student Photo Placeholder
-            p.setStrokeColorRGB(0.8, 0.8, 0.8)  # Light gray
-            p.rect(20, 70, 80, 100)  # Photo area
-            p.setFont("Helvetica", 10)
-            p.drawString(30, 125, "PHOTO")
-            
-            # Student Information
-            p.setFont("Helvetica", 10)
-            p.drawString(120, 140, f"ID: {student.student_id}")
-            p.drawString(120, 120, f"Name: {student.full_name}")
-            p.drawString(120, 100, f"Class: {student.current_class}")
-            p.drawString(120, 80, f"Valid: {datetime.date.today().year}")
-            
-            # Barcode placeholder
-            p.setStrokeColorRGB(0.8, 0.8, 0.8)
-            p.rect(120, 30, 150, 40)
-            p.setFont("Helvetica", 8)
-            p.drawString(170, 50, f"BARCODE: {student.student_id}")
-            
-            # Footer
-            p.setFont("Helvetica-Oblique", 8)
-            p.drawString(20, 20, "Issued by New Hope College Administration")
-            
-            p.showPage()  # New page for next ID card
-        
-        p.save()
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="student_id_cards.pdf"'
-        return response
+        return pdf.render_pdf('id_card', pdf.student_rows(queryset), 'student_id_cards.pdf')
     
     generate_student_id_cards.short_description = "🪪 Generate student ID cards"
     
@@ -396,46 +248,9 @@ class StudentAdmin(admin.ModelAdmin):
     create_student_groups.short_description = "🏷️ Create student groups"
     
     # 8. Generate Parent Meeting Schedules
+    @background_action
     def generate_parent_meeting_schedules(self, request, queryset):
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(100, 750, "Parent-Teacher Meeting Schedule")
-        p.setFont("Helvetica", 10)
-        p.drawString(400, 750, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d')}")
-        
-        y_position = 700
-        time_slot = datetime.time(9, 0)  # Start at 9:00 AM
-        
-        for student in queryset:
-            if y_position < 100:
-                p.showPage()
-                p.setFont("Helvetica", 12)
-                y_position = 750
-            
-            p.setFont("Helvetica-Bold", 12)
-            p.drawString(100, y_position, f"{time_slot.strftime('%I:%M %p')} - {student.full_name}")
-            y_position -= 15
-            p.setFont("Helvetica", 11)
-            p.drawString(100, y_position, f"Student ID: {student.student_id}")
-            y_position -= 15
-            p.drawString(100, y_position, f"Class: {student.current_class}")
-            y_position -= 15
-            p.drawString(100, y_position, f"Parent: {student.parent_guardian_name}")
-            y_position -= 15
-            p.drawString(100, y_position, f"Contact: {student.parent_guardian_contact}")
-            y_position -= 30
-            
-            # Increment time slot by 15 minutes
-            time_slot = (datetime.datetime.combine(datetime.date.today(), time_slot) + 
-                        datetime.timedelta(minutes=15)).time()
-        
-        p.save()
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="parent_meeting_schedule.pdf"'
-        return response
+        return pdf.render_pdf('meeting_schedule', pdf.student_rows(queryset), 'parent_meeting_schedule.pdf')
     
     generate_parent_meeting_schedules.short_description = "📅 Generate parent meeting schedules"
     
@@ -484,7 +299,7 @@ class StudentAdmin(admin.ModelAdmin):
         }
         return render(request, 'admin/import_photos_form.html', context)
     
-    # UPDATED: Excel import method - REMOVED status field
+    # Excel import - validated and written in batches by StudentImporter
     def import_excel(self, request):
         if request.method == 'POST':
             form = ImportExcelForm(request.POST, request.FILES)
@@ -492,42 +307,24 @@ class StudentAdmin(admin.ModelAdmin):
                 excel_file = request.FILES['excel_file']
                 try:
                     df = pd.read_excel(excel_file, engine='openpyxl')
+                    importer = StudentImporter()
                     
-                    # Updated required columns for new field structure
-                    required_columns = {'full_name', 'email'}
-                    if not required_columns.issubset(df.columns):
-                        missing = required_columns - set(df.columns)
+                    missing = importer.missing_columns(df)
+                    if missing:
                         messages.error(request, f'Missing required columns: {missing}')
                     else:
-                        success_count = 0
-                        for _, row in df.iterrows():
-                            # Create admin user for the student
-                            user, created = User.objects.get_or_create(
-                                username=row['email'],
-                                defaults={
-                                    'email': row['email'],
-                                    'first_name': row['full_name'].split()[0] if ' ' in row['full_name'] else row['full_name'],
-                                    'last_name': row['full_name'].split()[-1] if ' ' in row['full_name'] else '',
-                                    'is_staff': True  # Admin privilege
-                                }
-                            )
-                            
-                            # Create or update the Student with new fields - REMOVED status
-                            student, created = Student.objects.update_or_create(
-                                user=user,
-                                defaults={
-                                    'full_name': row['full_name'],
-                                    'date_of_birth': row.get('date_of_birth'),
-                                    'date_of_admission': row.get('date_of_admission', datetime.date.today()),
-                                    'parent_guardian_name': row.get('parent_guardian_name', ''),
-                                    'parent_guardian_contact': row.get('parent_guardian_contact', ''),
-                                    'address': row.get('address', ''),
-                                    'current_class': row.get('current_class', None)
-                                }
-                            )
-                            success_count += 1
-                        messages.success(request, f'Successfully imported/updated {success_count} students.')
-                        return HttpResponseRedirect('../')
+                        result = importer.run(df)
+                        messages.success(
+                            request,
+                            f"Imported {result['created']} new and updated {result['updated']} existing students "
+                            f"({result['rows_per_second']} rows/sec)."
+                        )
+                        if result['errors']:
+                            messages.warning(request, f"{len(result['errors'])} row(s) were skipped because of errors.")
+                        return render(request, 'admin/import_excel_result.html', {
+                            'result': result,
+                            'title': 'Student Import Results',
+                        })
                 except Exception as e:
                     messages.error(request, f'Error processing file: {str(e)}')
         else:
@@ -537,12 +334,12 @@ class StudentAdmin(admin.ModelAdmin):
         schema = [
             {'column': 'full_name', 'required': True, 'description': 'Student full name'},
             {'column': 'email', 'required': True, 'description': 'Email (used for admin login)'},
-            {'column': 'date_of_birth', 'required': False, 'description': 'YYYY-MM-DD format (cannot be today)'},
+            {'column': 'date_of_birth', 'required': True, 'description': 'YYYY-MM-DD format (cannot be today)'},
             {'column': 'date_of_admission', 'required': False, 'description': 'YYYY-MM-DD format (defaults to today)'},
             {'column': 'parent_guardian_name', 'required': False, 'description': 'Parent/Guardian full name'},
             {'column': 'parent_guardian_contact', 'required': False, 'description': 'Phone number'},
             {'column': 'address', 'required': False, 'description': 'Full physical address'},
-            {'column': 'current_class', 'required': False, 'description': 'Class ID (e.g., Form 1A)'},
+            {'column': 'current_class', 'required': False, 'description': 'Class name or ID (e.g., Form 1A)'},
         ]
         
         context = {
@@ -553,81 +350,16 @@ class StudentAdmin(admin.ModelAdmin):
         return render(request, 'admin/import_excel.html', context)
 
     # PDF Export Method - REMOVED status field
+    @background_action
     def export_as_pdf(self, request, queryset):
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        
-        # Set up PDF title
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(100, 750, "New Hope College - Student Report")
-        
-        # Add generation date
-        p.setFont("Helvetica", 10)
-        p.drawString(400, 750, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        
-        # Draw a line
-        p.line(100, 735, 500, 735)
-        
-        # Add student information
-        y_position = 700
-        p.setFont("Helvetica", 12)
-        
-        for student in queryset:
-            if y_position < 100:  # New page if running out of space
-                p.showPage()
-                p.setFont("Helvetica", 12)
-                y_position = 750
-            
-            p.drawString(100, y_position, f"Student ID: {student.student_id}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Name: {student.full_name}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Class: {student.current_class}")
-            y_position -= 20
-            p.drawString(100, y_position, f"Admission Date: {student.date_of_admission}")
-            y_position -= 30  # Extra space between students
-            
-        p.showPage()
-        p.save()
-        
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="student_report.pdf"'
-        return response
+        return pdf.render_pdf('student_list', pdf.student_rows(queryset), 'student_report.pdf')
     
     export_as_pdf.short_description = "Export selected students as PDF"
 
     # NEW ACTION: Generate Fee Payment Report
+    @background_action
     def generate_fee_payment_report(self, request, queryset):
-        from django.http import HttpResponse
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import letter
-        from io import BytesIO
-        
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(100, 750, "New Hope College - Fee Payment Report")
-        
-        y_position = 700
-        p.setFont("Helvetica", 12)
-        
-        for student in queryset:
-            p.drawString(100, y_position, f"Student: {student.full_name} ({student.student_id})")
-            y_position -= 20
-            p.drawString(100, y_position, f"Class: {student.current_class}")
-            y_position -= 20
-            p.drawString(100, y_position, "Fee Status: [To be implemented with Fee model]")
-            y_position -= 40
-        
-        p.showPage()
-        p.save()
-        
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="fee_report.pdf"'
-        return response
+        return pdf.render_pdf('fee_payment', pdf.student_rows(queryset), 'fee_report.pdf')
     
     generate_fee_payment_report.short_description = "📊 Generate fee payment report"
 
@@ -645,48 +377,25 @@ class StudentAdmin(admin.ModelAdmin):
 
     # NEW ACTION: Promote to Next Class
     def promote_to_next_class(self, request, queryset):
-        from django.db.models import Q
-        
-        promoted_count = 0
-        for student in queryset:
-            if student.current_class:
-                current_class = student.current_class
-                
-                # Determine next class based on current class name
-                # This is a basic implementation - you'll need to customize the logic
-                if 'Form 1' in current_class.name:
-                    next_class_name = current_class.name.replace('Form 1', 'Form 2')
-                elif 'Form 2' in current_class.name:
-                    next_class_name = current_class.name.replace('Form 2', 'Form 3')
-                elif 'Form 3' in current_class.name:
-                    next_class_name = current_class.name.replace('Form 3', 'Form 4')
-                elif 'Form 4' in current_class.name:
-                    next_class_name = current_class.name.replace('Form 4', 'Form 5')
-                elif 'Form 5' in current_class.name:
-                    next_class_name = current_class.name.replace('Form 5', 'LowerSixth')
-                else:
-                    next_class_name = None
-                
-                if next_class_name:
-                    # Find the next class
-                    next_class = Class.objects.filter(
-                        Q(name=next_class_name) | Q(name__contains=next_class_name),
-                        academic_year=current_class.academic_year
-                    ).first()
-                    
-                    if next_class:
-                        student.current_class = next_class
-                        student.save()
-                        promoted_count += 1
+        # One mapping for the selected students' classes, then one UPDATE per mapping
+        classes = Class.objects.filter(students__in=queryset).distinct()
+        plan = PromotionPlan(classes, student_ids=queryset.values_list('pk', flat=True))
+        promoted_count = plan.apply()
         
         if promoted_count > 0:
             messages.success(request, f"Successfully promoted {promoted_count} student(s) to next class.")
         else:
             messages.warning(request, "No students could be promoted. Check class naming patterns.")
+        if plan.unmatched:
+            messages.warning(
+                request,
+                "No next class found for: " + ", ".join(class_obj.name for class_obj in plan.unmatched)
+            )
     
     promote_to_next_class.short_description = "⬆️ Promote exceptionally to next class"
 
     # NEW ACTION: Send WhatsApp Report
+    @background_action
     def send_whatsapp_report(self, request, queryset):
         # Note: This requires WhatsApp Business API setup
         # This is a placeholder for the implementation
@@ -729,6 +438,7 @@ class DepartmentAdmin(admin.ModelAdmin):
     ]
     
     # 1. Export Department List
+    @background_action
     def export_department_list(self, request, queryset):
         import csv
         from django.http import HttpResponse
@@ -739,19 +449,13 @@ class DepartmentAdmin(admin.ModelAdmin):
         writer = csv.writer(response)
         writer.writerow(['Department Name', 'Classes Count', 'Teachers Count', 'Students Count'])
         
-        for department in queryset:
-            classes_count = Class.objects.filter(department=department).count()
-            teachers_count = Teacher.objects.filter(department=department).count()
-            
-            # Count students in this department through classes
-            department_classes = Class.objects.filter(department=department)
-            students_count = Student.objects.filter(current_class__in=department_classes).count()
-            
+        # Counts for every selected department come from one annotated query
+        for department in queryset.with_stats():
             writer.writerow([
                 department.name,
-                classes_count,
-                teachers_count,
-                students_count
+                department.class_count,
+                department.teacher_count,
+                department.student_count
             ])
         
         return response
@@ -793,6 +497,7 @@ class DepartmentAdmin(admin.ModelAdmin):
     assign_department_head.short_description = "👨‍💼 Assign department head"
     
     # 3. Generate Department Report
+    @background_action
     def generate_department_report(self, request, queryset):
         from reportlab.pdfgen import canvas
         from reportlab.lib.pagesizes import letter
@@ -807,7 +512,12 @@ class DepartmentAdmin(admin.ModelAdmin):
         
         y_position = 700
         
-        for department in queryset:
+        # Statistics come from one annotated query, class lists from one prefetch
+        departments = queryset.with_stats().prefetch_related(
+            Prefetch('classes', queryset=Class.objects.order_by('name'))
+        )
+        
+        for department in departments:
             if y_position < 100:
                 p.showPage()
                 p.setFont("Helvetica", 12)
@@ -817,22 +527,18 @@ class DepartmentAdmin(admin.ModelAdmin):
             p.drawString(100, y_position, f"Department: {department.name}")
             y_position -= 20
             
-            # Get statistics
-            classes = Class.objects.filter(department=department)
-            teachers = Teacher.objects.filter(department=department)
-            department_classes = Class.objects.filter(department=department)
-            students = Student.objects.filter(current_class__in=department_classes)
+            classes = department.classes.all()
             
             p.setFont("Helvetica", 12)
-            p.drawString(100, y_position, f"Classes: {classes.count()}")
+            p.drawString(100, y_position, f"Classes: {department.class_count}")
             y_position -= 20
-            p.drawString(100, y_position, f"Teachers: {teachers.count()}")
+            p.drawString(100, y_position, f"Teachers: {department.teacher_count}")
             y_position -= 20
-            p.drawString(100, y_position, f"Students: {students.count()}")
+            p.drawString(100, y_position, f"Students: {department.student_count}")
             y_position -= 40
             
             # List classes
-            if classes.exists():
+            if classes:
                 p.setFont("Helvetica-Bold", 12)
                 p.drawString(100, y_position, "Classes in this department:")
                 y_position -= 20
@@ -847,8 +553,8 @@ class DepartmentAdmin(admin.ModelAdmin):
                     p.drawString(120, y_position, f"• {class_obj.name} ({class_obj.level})")
                     y_position -= 15
                 
-                if classes.count() > 10:
-                    p.drawString(120, y_position, f"... and {classes.count() - 10} more classes")
+                if department.class_count > 10:
+                    p.drawString(120, y_position, f"... and {department.class_count - 10} more classes")
                     y_position -= 20
             
             y_position -= 30
@@ -1005,30 +711,23 @@ class ClassAdmin(admin.ModelAdmin):
     view_class_attendance_report.short_description = "📊 View class attendance report"
     
     def promote_entire_class(self, request, queryset):
-        promoted_count = 0
-        for class_obj in queryset:
-            # Find students in this class
-            students = Student.objects.filter(current_class=class_obj)
-            for student in students:
-                # Determine next class (simplified logic)
-                if class_obj.level == 'ORDINARY LEVEL':
-                    # Example: Form 1A → Form 2A
-                    next_name = class_obj.name.replace('Form 1', 'Form 2').replace('Form 2', 'Form 3').replace('Form 3', 'Form 4').replace('Form 4', 'Form 5')
-                    try:
-                        next_class = Class.objects.get(
-                            name=next_name,
-                            academic_year=class_obj.academic_year
-                        )
-                        student.current_class = next_class
-                        student.save()
-                        promoted_count += 1
-                    except Class.DoesNotExist:
-                        continue
+        plan = PromotionPlan(queryset)
+        
+        # First submission shows a dry-run preview; the confirm button posts back with 'apply'
+        if 'apply' not in request.POST:
+            return render(request, 'admin/promotion_preview.html', {
+                'title': 'Promote Entire Class - Preview',
+                'rows': plan.preview(),
+                'total_students': plan.total_students,
+                'classes': queryset,
+                'action': 'promote_entire_class',
+            })
         
+        promoted_count = plan.apply()
         if promoted_count > 0:
             self.message_user(
                 request,
-                f"Successfully promoted {promoted_count} student(s) from {queryset.count()} class(es).",
+                f"Successfully promoted {promoted_count} student(s) from {len(plan.steps)} class(es).",
                 messages.SUCCESS
             )
         else:
@@ -1037,6 +736,12 @@ class ClassAdmin(admin.ModelAdmin):
                 "No students could be promoted. Check class naming patterns.",
                 messages.WARNING
             )
+        if plan.unmatched:
+            self.message_user(
+                request,
+                "No next class found for: " + ", ".join(class_obj.name for class_obj in plan.unmatched),
+                messages.WARNING
+            )
     promote_entire_class.short_description = "⬆️ Promote entire class"
     
     def generate_class_performance_report(self, request, queryset):
@@ -1265,6 +970,7 @@ class TeacherAdmin(admin.ModelAdmin):
     bulk_assign_teachers_to_multiple_subjects.short_description = "📚 Bulk assign teachers to subjects"
     
     # 2. Generate Teacher Timetable Reports
+    @background_action
     def generate_teacher_timetable_reports(self, request, queryset):
         buffer = BytesIO()
         p = canvas.Canvas(buffer, pagesize=letter)
@@ -1315,44 +1021,10 @@ class TeacherAdmin(admin.ModelAdmin):
     generate_teacher_timetable_reports.short_description = "📅 Generate teacher timetable reports"
     
     # 3. Export Teacher Contact Directory
+    @background_action
     def export_teacher_contact_directory(self, request, queryset):
-        import openpyxl
-        from openpyxl.utils import get_column_letter
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Teachers Directory"
-        
-        headers = [
-            'Teacher ID', 'Full Name', 'Department', 'Phone Number', 
-            'Email', 'Employment Date', 'Status', 'Subjects'
-        ]
-        
-        for col_num, header in enumerate(headers, 1):
-            col_letter = get_column_letter(col_num)
-            ws[f'{col_letter}1'] = header
-            ws.column_dimensions[col_letter].width = 20
-        
-        for row_num, teacher in enumerate(queryset, 2):
-            ws[f'A{row_num}'] = teacher.teacher_id
-            ws[f'B{row_num}'] = teacher.full_name
-            ws[f'C{row_num}'] = str(teacher.department) if teacher.department else ''
-            ws[f'D{row_num}'] = teacher.phone_number
-            ws[f'E{row_num}'] = teacher.email
-            ws[f'F{row_num}'] = str(teacher.employment_date) if teacher.employment_date else ''
-            ws[f'G{row_num}'] = teacher.status
-            ws[f'H{row_num}'] = ', '.join([str(subject) for subject in teacher.subjects.all()])
-        
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        response = HttpResponse(
-            buffer,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="teachers_directory.xlsx"'
-        return response
+        rows = exports.teacher_rows(queryset)
+        return exports.stream_xlsx('teachers_directory.xlsx', 'Teachers Directory', exports.TEACHER_HEADERS, rows)
     
     export_teacher_contact_directory.short_description = "📇 Export teacher contact directory"
     
@@ -1418,13 +1090,16 @@ class TeacherAdmin(admin.ModelAdmin):
     assign_teachers_as_class_masters.short_description = "👨‍🏫 Assign teachers as class masters"
     
     # 7. Bulk Send WhatsApp Notifications to Teachers
+    @background_action
     def bulk_send_whatsapp_notifications_to_teachers(self, request, queryset):
         if request.method == 'POST':
             message = request.POST.get('message', '')
             sent_count = 0
             failed_count = 0
             
-            for teacher in queryset:
+            total = len(queryset)
+            for done, teacher in enumerate(queryset, 1):
+                report_progress(request, done, total)
                 if teacher.phone_number:
                     try:
                         # WhatsApp integration placeholder
@@ -1493,6 +1168,89 @@ class TeacherAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Read-only "Jobs" page that background admin actions redirect to"""
+    list_display = ('id', 'name', 'status', 'progress_display', 'created_by', 'created_at', 'finished_at', 'result_link')
+    list_filter = ('status', 'model_label')
+    search_fields = ('name', 'action')
+    readonly_fields = (
+        'name', 'model_label', 'action', 'status', 'progress_display', 'result_link',
+        'message', 'created_by', 'created_at', 'started_at', 'finished_at',
+    )
+    exclude = ('object_ids', 'params', 'progress', 'total')
+    change_form_template = 'admin/core/job/change_form.html'
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:job_id>/status/', self.admin_site.admin_view(self.job_status), name='core_job_status'),
+            path('<int:job_id>/result/', self.admin_site.admin_view(self.download_result), name='core_job_result'),
+        ]
+        return custom_urls + urls
+    
+    def get_queryset(self, request):
+        # Whether a result exists, without loading the file itself
+        return super().get_queryset(request).annotate(
+            has_result=Exists(JobResult.objects.filter(job=OuterRef('pk')))
+        )
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def can_download(self, request, job):
+        # Results often hold student data: only the job's creator and superusers get them
+        return self.has_view_permission(request, job) and (
+            request.user.is_superuser or job.created_by_id == request.user.pk
+        )
+    
+    def progress_display(self, obj):
+        return f"{obj.percent}% ({obj.progress}/{obj.total})"
+    progress_display.short_description = "Progress"
+    
+    def result_link(self, obj):
+        if getattr(obj, 'has_result', False):
+            return format_html('<a href="{}">📥 Download</a>', reverse('admin:core_job_result', args=[obj.pk]))
+        return '-'
+    result_link.short_description = "Result"
+    
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        extra_context = extra_context or {}
+        job = self.get_queryset(request).filter(pk=object_id).first()
+        if job is not None and job.has_result and self.can_download(request, job):
+            extra_context['result_url'] = reverse('admin:core_job_result', args=[job.pk])
+        return super().change_view(request, object_id, form_url, extra_context)
+    
+    # Polled by the job page while the worker is running
+    def job_status(self, request, job_id):
+        job = self.get_queryset(request).filter(pk=job_id).first()
+        if job is None or not self.has_view_permission(request, job):
+            return JsonResponse({'error': 'Job not found'}, status=404)
+        show_result = job.has_result and self.can_download(request, job)
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'percent': job.percent,
+            'progress': job.progress,
+            'total': job.total,
+            'finished': job.is_finished,
+            'result_url': reverse('admin:core_job_result', args=[job.pk]) if show_result else None,
+        })
+    
+    def download_result(self, request, job_id):
+        job = get_object_or_404(Job, pk=job_id)
+        if not self.can_download(request, job):
+            raise PermissionDenied
+        result = get_object_or_404(JobResult, job=job)
+        return FileResponse(
+            BytesIO(result.content), as_attachment=True,
+            filename=result.filename, content_type=result.content_type,
+        )
+
+
 # Register custom User admin with new actions
 @admin.register(User)
 class CustomUserAdmin(BaseUserAdmin):
@@ -5,4 +5,8 @@ class CoreConfig(AppConfig):
     # Name must match the full directory path
     name = 'backend.core'
     # Label is how Django refers to it in settings and models
-    label = 'core'
\ No newline at end of file
+    label = 'core'
+
+    def ready(self):
+        # Cache invalidation for the versioned keys in cache_keys.py
+        from . import signals  # noqa: F401
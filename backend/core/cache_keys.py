@@ -0,0 +1,42 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Bumped whenever students, teachers, classes, departments or subjects change.
+# Every cached value built from that data has the version in its key, so a
+# bump makes all of them unreachable at once and they simply expire.
+DATA_VERSION_KEY = 'core:data_version'
+
+
+def data_version():
+    """Current data version, starting a new one if the cache has none"""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1, so a version lost to eviction or a
+        # cache restart can never collide with keys written under an older one.
+        cache.add(DATA_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def bump_data_version():
+    """
+    Invalidate everything cached with versioned_key() once the current
+    transaction commits (immediately outside a transaction), so no request
+    can re-cache the old data under the new version before it is visible.
+    """
+    transaction.on_commit(_incr_data_version)
+
+
+def _incr_data_version():
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        # No version stored yet; nothing cached under one can exist either
+        data_version()
+
+
+def versioned_key(*parts):
+    """Cache key for data derived from the core models, e.g. versioned_key('metrics', 'school')"""
+    return ':'.join(['core', str(data_version()), *[str(part) for part in parts]])
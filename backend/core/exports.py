@@ -0,0 +1,83 @@
+import tempfile
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+from django.db.models import Prefetch
+from django.http import FileResponse
+
+from .models import Subject
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows fetched from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+STUDENT_HEADERS = [
+    'Student ID', 'Full Name', 'Date of Birth', 'Date of Admission',
+    'Current Class', 'Parent/Guardian Name', 'Parent/Guardian Contact',
+    'Address', 'Email', 'Username'
+]
+
+TEACHER_HEADERS = [
+    'Teacher ID', 'Full Name', 'Department', 'Phone Number',
+    'Email', 'Employment Date', 'Status', 'Subjects'
+]
+
+
+def stream_xlsx(filename, sheet_title, headers, rows, column_width=20):
+    """
+    Write rows into a write-only workbook and stream it back as a download.
+
+    Write-only worksheets flush each row to a temporary file instead of
+    keeping a cell object per value, so memory stays flat no matter how
+    many rows are exported. The temp file is closed when the response ends.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    for col_num in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = column_width
+
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+
+    spool = tempfile.TemporaryFile()
+    wb.save(spool)
+    spool.seek(0)
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def student_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """One row per student; user and class are joined instead of queried per row"""
+    queryset = queryset.select_related('user', 'current_class__department')
+    for student in queryset.iterator(chunk_size=chunk_size):
+        yield [
+            student.student_id,
+            student.full_name,
+            str(student.date_of_birth) if student.date_of_birth else '',
+            str(student.date_of_admission) if student.date_of_admission else '',
+            str(student.current_class) if student.current_class else '',
+            student.parent_guardian_name,
+            student.parent_guardian_contact,
+            student.address,
+            student.user.email if student.user else '',
+            student.user.username if student.user else '',
+        ]
+
+
+def teacher_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """One row per teacher; subjects are prefetched once per chunk"""
+    queryset = queryset.select_related('department').prefetch_related(
+        Prefetch('subjects', queryset=Subject.objects.select_related('department'))
+    )
+    for teacher in queryset.iterator(chunk_size=chunk_size):
+        yield [
+            teacher.teacher_id,
+            teacher.full_name,
+            str(teacher.department) if teacher.department else '',
+            teacher.phone_number,
+            teacher.email,
+            str(teacher.employment_date) if teacher.employment_date else '',
+            teacher.status,
+            ', '.join([str(subject) for subject in teacher.subjects.all()]),
+        ]
@@ -0,0 +1,193 @@
+import datetime
+import time
+
+import pandas as pd
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .cache_keys import bump_data_version
+from .models import Student, Class, User
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+# Columns the sheet may provide, with the Student field they map to
+OPTIONAL_TEXT_COLUMNS = {
+    'parent_guardian_name': 200,
+    'parent_guardian_contact': 20,
+    'address': None,
+}
+
+
+class StudentImporter:
+    """
+    Batched admission import for StudentAdmin.import_excel.
+
+    The whole sheet is validated with pandas up front, then Users and Students
+    are written with bulk_create/bulk_update in chunks inside one transaction.
+    Rows that fail validation are reported back and skipped; the rest are imported.
+    """
+    required_columns = {'full_name', 'email'}
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+
+    def missing_columns(self, df):
+        return self.required_columns - set(df.columns)
+
+    def run(self, df):
+        started = time.monotonic()
+        df = df.rename(columns=lambda column: str(column).strip())
+        rows, errors = self._validate(df)
+
+        created = updated = 0
+        if len(rows):
+            with transaction.atomic():
+                user_ids = self._save_users(rows)
+                created, updated = self._save_students(rows, user_ids)
+            # bulk_create/bulk_update send no signals
+            bump_data_version()
+
+        elapsed = time.monotonic() - started
+        return {
+            'total_rows': len(df),
+            'created': created,
+            'updated': updated,
+            'errors': errors,
+            'seconds': round(elapsed, 2),
+            # Imported rows only; skipped ones are in errors
+            'rows_per_second': round(len(rows) / elapsed, 1) if elapsed else len(rows),
+        }
+
+    # --- VALIDATION ---
+
+    def _validate(self, df):
+        """Return (valid rows DataFrame, list of per-row errors)"""
+        today = pd.Timestamp(datetime.date.today())
+        # Excel row numbers: header is row 1
+        excel_row = pd.Series(df.index + 2, index=df.index)
+        problems = pd.Series('', index=df.index)
+
+        def flag(mask, message):
+            mask = mask.fillna(False).astype(bool)
+            problems.loc[mask] = problems.loc[mask] + message + '; '
+
+        clean = pd.DataFrame(index=df.index)
+        clean['full_name'] = self._text(df, 'full_name')
+        clean['email'] = self._text(df, 'email')
+
+        flag(clean['full_name'] == '', 'full_name is required')
+        flag(clean['full_name'].str.len() > 200, 'full_name is longer than 200 characters')
+        flag(clean['email'] == '', 'email is required')
+        flag((clean['email'] != '') & ~clean['email'].str.match(EMAIL_PATTERN), 'email is not valid')
+        flag((clean['email'] != '') & clean['email'].duplicated(keep='first'), 'email appears more than once in the sheet')
+
+        # Dates
+        raw_dob = df['date_of_birth'] if 'date_of_birth' in df.columns else pd.Series(pd.NaT, index=df.index)
+        clean['date_of_birth'] = pd.to_datetime(raw_dob, errors='coerce')
+        flag(raw_dob.isna(), 'date_of_birth is required')
+        flag(raw_dob.notna() & clean['date_of_birth'].isna(), 'date_of_birth is not a valid date')
+        flag(clean['date_of_birth'].dt.normalize() == today, 'date_of_birth cannot be today')
+
+        if 'date_of_admission' in df.columns:
+            raw_admission = df['date_of_admission']
+            clean['date_of_admission'] = pd.to_datetime(raw_admission, errors='coerce')
+            flag(raw_admission.notna() & clean['date_of_admission'].isna(), 'date_of_admission is not a valid date')
+            clean['date_of_admission'] = clean['date_of_admission'].fillna(today)
+        else:
+            clean['date_of_admission'] = today
+
+        for column, max_length in OPTIONAL_TEXT_COLUMNS.items():
+            clean[column] = self._text(df, column)
+            if max_length:
+                flag(clean[column].str.len() > max_length, f'{column} is longer than {max_length} characters')
+
+        # Classes are resolved with a single query for the whole sheet
+        class_names = self._text(df, 'current_class')
+        class_lookup = self._class_lookup()
+        clean['current_class_id'] = class_names.map(class_lookup)
+        flag((class_names != '') & clean['current_class_id'].isna(), 'current_class does not match any class')
+
+        invalid = problems != ''
+        errors = [
+            {'row': int(row), 'email': email, 'message': message.rstrip('; ')}
+            for row, email, message in zip(excel_row[invalid], clean.loc[invalid, 'email'], problems[invalid])
+        ]
+        return clean.loc[~invalid], errors
+
+    def _text(self, df, column):
+        if column not in df.columns:
+            return pd.Series('', index=df.index)
+        return df[column].fillna('').astype(str).str.strip()
+
+    def _class_lookup(self):
+        """Map class name (and id) to class id; the latest academic year wins on duplicate names"""
+        lookup = {}
+        for class_id, name in Class.objects.order_by('academic_year', 'id').values_list('id', 'name'):
+            lookup[name.strip()] = class_id
+            lookup[str(class_id)] = class_id
+        return lookup
+
+    # --- WRITES ---
+
+    def _save_users(self, rows):
+        """Create missing users in bulk and return {email: user_id}"""
+        emails = rows['email'].tolist()
+        user_ids = dict(User.objects.filter(username__in=emails).values_list('username', 'id'))
+
+        new_users = []
+        for email, full_name in zip(rows['email'], rows['full_name']):
+            if email in user_ids:
+                continue
+            new_users.append(User(
+                username=email,
+                email=email,
+                first_name=full_name.split()[0] if ' ' in full_name else full_name,
+                last_name=full_name.split()[-1] if ' ' in full_name else '',
+                is_staff=True,  # Admin privilege
+                password=make_password(None),
+            ))
+        if new_users:
+            User.objects.bulk_create(new_users, batch_size=self.batch_size)
+            user_ids.update(
+                User.objects.filter(username__in=[user.username for user in new_users]).values_list('username', 'id')
+            )
+        return user_ids
+
+    def _save_students(self, rows, user_ids):
+        """Update students that already exist for these users, bulk create the rest"""
+        existing = {
+            student.user_id: student
+            for student in Student.objects.filter(user_id__in=list(user_ids.values()))
+        }
+        fields = [
+            'full_name', 'date_of_birth', 'date_of_admission', 'parent_guardian_name',
+            'parent_guardian_contact', 'address', 'current_class_id',
+        ]
+
+        to_create, to_update = [], []
+        for row in rows.itertuples(index=False):
+            values = {
+                'full_name': row.full_name,
+                'date_of_birth': row.date_of_birth.date(),
+                'date_of_admission': row.date_of_admission.date(),
+                'parent_guardian_name': row.parent_guardian_name,
+                'parent_guardian_contact': row.parent_guardian_contact,
+                'address': row.address,
+                'current_class_id': None if pd.isna(row.current_class_id) else int(row.current_class_id),
+            }
+            student = existing.get(user_ids[row.email])
+            if student:
+                for field, value in values.items():
+                    setattr(student, field, value)
+                to_update.append(student)
+            else:
+                to_create.append(Student(user_id=user_ids[row.email], **values))
+
+        if to_update:
+            Student.objects.bulk_update(to_update, fields, batch_size=self.batch_size)
+        if to_create:
+            # One sequence update reserves IDs for the whole admission batch
+            for student, student_id in zip(to_create, Student.allocate_student_ids(len(to_create))):
+                student.student_id = student_id
+            Student.objects.bulk_create(to_create, batch_size=self.batch_size)
+        return len(to_create), len(to_update)
@@ -0,0 +1,158 @@
+import functools
+import re
+import traceback
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest, QueryDict
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Job, JobResult
+
+# POST fields the admin adds to every action submission - not worth storing on the job
+ADMIN_ACTION_FIELDS = {'csrfmiddlewaretoken', 'action', 'select_across', 'index', '_selected_action'}
+
+FILENAME_PATTERN = re.compile(r'filename="?([^";]+)"?')
+
+
+def background_action(func):
+    """
+    Opt an admin action into the background job queue.
+
+    With BACKGROUND_JOBS enabled the admin POST only records a Job and
+    redirects to it; the worker (python manage.py runjobs) later replays the
+    action and stores any file it returns on the job. Without it, or when
+    the worker itself calls the action, it runs inline as before.
+    """
+    @functools.wraps(func)
+    def wrapper(modeladmin, request, queryset):
+        if not getattr(settings, 'BACKGROUND_JOBS', False) or isinstance(request, JobRequest):
+            return func(modeladmin, request, queryset)
+
+        params = {
+            key: request.POST.getlist(key)
+            for key in request.POST
+            if key not in ADMIN_ACTION_FIELDS
+        }
+        object_ids = list(queryset.values_list('pk', flat=True))
+        job = Job.objects.create(
+            name=str(getattr(wrapper, 'short_description', func.__name__)),
+            model_label=queryset.model._meta.label_lower,
+            action=func.__name__,
+            object_ids=object_ids,
+            params=params,
+            total=len(object_ids),
+            created_by=request.user if request.user.is_authenticated else None,
+        )
+        modeladmin.message_user(
+            request,
+            f"Job #{job.pk} queued for {len(object_ids)} record(s). This page updates when it finishes.",
+            messages.INFO
+        )
+        return redirect(reverse('admin:core_job_change', args=[job.pk]))
+
+    return wrapper
+
+
+def report_progress(request, done, total=None):
+    """Record progress from inside an action; does nothing for normal admin requests"""
+    job = getattr(request, 'job', None)
+    if job is None:
+        return
+    if total is not None:
+        job.total = total
+    # Only write when the visible percentage changes, not once per row
+    previous = job.percent
+    job.progress = done
+    if job.percent != previous or done == job.total:
+        Job.objects.filter(pk=job.pk).update(progress=job.progress, total=job.total)
+
+
+class JobMessages:
+    """Stands in for the messages framework so action feedback ends up on the job"""
+
+    def __init__(self):
+        self.lines = []
+
+    def add(self, level, message, extra_tags=''):
+        self.lines.append(str(message))
+
+    def __iter__(self):
+        return iter(self.lines)
+
+
+class JobRequest(HttpRequest):
+    """Replays the original admin POST for an action running in the worker"""
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.method = 'POST'
+        self.path = reverse('admin:core_job_change', args=[job.pk])
+        self.user = job.created_by or AnonymousUser()
+        self.POST = QueryDict(mutable=True)
+        for key, values in job.params.items():
+            self.POST.setlist(key, values)
+        self.META['SERVER_NAME'] = 'localhost'
+        self.META['SERVER_PORT'] = '80'
+        self._messages = JobMessages()
+
+
+# --- WORKER ---
+
+def claim_next_job():
+    """Atomically move the oldest pending job to RUNNING; returns None when the queue is empty"""
+    for job_id in Job.objects.filter(status='PENDING').order_by('created_at').values_list('pk', flat=True)[:10]:
+        # The conditional UPDATE makes sure only one worker wins each job
+        claimed = Job.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING', started_at=timezone.now()
+        )
+        if claimed:
+            return Job.objects.select_related('created_by').get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    """Execute a claimed job and record the outcome"""
+    request = JobRequest(job)
+    try:
+        model = apps.get_model(job.model_label)
+        modeladmin = admin.site._registry[model]
+        queryset = model._default_manager.filter(pk__in=job.object_ids)
+        response = getattr(modeladmin, job.action)(request, queryset)
+        _store_result(job, response)
+        job.status = 'SUCCEEDED'
+        job.progress = job.total
+    except Exception:
+        job.status = 'FAILED'
+        request._messages.add(messages.ERROR, traceback.format_exc())
+
+    job.message = '\n'.join(request._messages)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'message', 'finished_at'])
+    return job
+
+
+def _store_result(job, response):
+    """Keep the file an action returned (PDF, Excel, ...) so it can be downloaded later"""
+    if response is None or response.status_code != 200:
+        return
+    match = FILENAME_PATTERN.search(response.get('Content-Disposition', ''))
+    if not match:
+        return
+
+    if getattr(response, 'streaming', False):
+        content = b''.join(response.streaming_content)
+        response.close()
+    else:
+        content = response.content
+    # In the database, so the web process can serve what the worker produced
+    JobResult.objects.update_or_create(job=job, defaults={
+        'filename': match.group(1),
+        'content_type': response.get('Content-Type', 'application/octet-stream'),
+        'content': content,
+    })
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from backend.core.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued admin jobs (PDF generation, exports, promotions, WhatsApp sends)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the pending jobs and exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Job worker started.'))
+        try:
+            while True:
+                close_old_connections()
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                self.stdout.write(f'Running job #{job.pk}: {job.name}')
+                job = run_job(job)
+                style = self.style.SUCCESS if job.status == 'SUCCEEDED' else self.style.ERROR
+                self.stdout.write(style(f'Job #{job.pk} {job.get_status_display().lower()}'))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Job worker stopped.'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['parent_guardian_contact'], name='student_parent_contact_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['phone_number'], name='teacher_phone_idx'),
+        ),
+    ]
@@ -6,4 +6,6 @@ from .department import Department
 from .subject import Subject
 from .teacher import Teacher
 from .user import User
-__all__ = ['Student', 'Class', 'Department', 'Subject', 'Teacher']
\ No newline at end of file
+from .id_sequence import IDSequence
+from .job import Job, JobResult
+__all__ = ['Student', 'Class', 'Department', 'Subject', 'Teacher', 'IDSequence', 'Job', 'JobResult']
\ No newline at end of file
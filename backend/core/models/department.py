@@ -1,4 +1,39 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_subquery(queryset, lookup):
+    """Correlated COUNT(*) of `queryset` rows whose `lookup` points at the outer department"""
+    counts = (
+        queryset.filter(**{lookup: OuterRef('pk')})
+        .order_by()
+        .values(lookup)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class DepartmentQuerySet(models.QuerySet):
+    def with_stats(self):
+        """
+        Annotate class/teacher/student/subject counts for every department
+        in a single query, instead of several count() queries per department.
+        """
+        # Imported here because these models import Department themselves
+        from .school_class import Class
+        from .student import Student
+        from .subject import Subject
+        from .teacher import Teacher
+
+        return self.annotate(
+            num_classes=_count_subquery(Class.objects.all(), 'department'),
+            num_teachers=_count_subquery(Teacher.objects.all(), 'department'),
+            num_students=_count_subquery(Student.objects.all(), 'current_class__department'),
+            num_subjects=_count_subquery(Subject.objects.all(), 'department'),
+        )
+
 
 class Department(models.Model):
     DEPARTMENT_CHOICES = [
@@ -6,24 +41,42 @@ class Department(models.Model):
         ('GENERAL', 'General'),
         ('COMMERCIAL', 'Commercial'),
     ]
-    
+
     name = models.CharField(max_length=20, choices=DEPARTMENT_CHOICES, unique=True)
 
+    objects = DepartmentQuerySet.as_manager()
+
     def __str__(self):
         return self.get_name_display()
-    
+
+    # The count properties reuse the with_stats() annotations when present,
+    # so templates iterating over Department.objects.with_stats() cost no extra queries.
+
     @property
     def teacher_count(self):
         """Return the number of teachers in this department"""
+        if hasattr(self, 'num_teachers'):
+            return self.num_teachers
         return self.teacher_set.count()
-    
+
     @property
     def class_count(self):
         """Return the number of classes in this department"""
-        return self.schoolclass_set.count()
-    
+        if hasattr(self, 'num_classes'):
+            return self.num_classes
+        return self.classes.count()
+
     @property
     def student_count(self):
         """Return the number of students in this department (through their classes)"""
+        if hasattr(self, 'num_students'):
+            return self.num_students
         from .student import Student
-        return Student.objects.filter(current_class__department=self).count()
\ No newline at end of file
+        return Student.objects.filter(current_class__department=self).count()
+
+    @property
+    def subject_count(self):
+        """Return the number of subjects offered by this department"""
+        if hasattr(self, 'num_subjects'):
+            return self.num_subjects
+        return self.subjects.count()
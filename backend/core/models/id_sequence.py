@@ -0,0 +1,49 @@
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+
+
+class IDSequence(models.Model):
+    """
+    Per-prefix counter used to hand out Student/Teacher IDs.
+    One row per prefix (e.g. 'NHC-2025', 'NHC-T-2025'), incremented in place
+    so allocating an ID never has to scan the students/teachers tables.
+    """
+    prefix = models.CharField(max_length=20, unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        app_label = 'core'
+        verbose_name = "ID Sequence"
+        verbose_name_plural = "ID Sequences"
+
+    def __str__(self):
+        return f"{self.prefix} (last: {self.last_value})"
+
+    @classmethod
+    def allocate(cls, prefix, count=1, seed=None):
+        """
+        Reserve `count` consecutive numbers for `prefix` and return the first one.
+
+        The UPDATE ... SET last_value = last_value + count takes a row lock
+        (a write lock on SQLite), so concurrent admins never get the same block.
+        `seed` is only called the first time a prefix is seen, to continue
+        numbering from IDs that were created before the sequence existed.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+
+        with transaction.atomic():
+            updated = cls.objects.filter(prefix=prefix).update(last_value=F('last_value') + count)
+            if not updated:
+                start = seed() if seed else 0
+                try:
+                    # Savepoint so a lost creation race doesn't break the outer transaction
+                    with transaction.atomic():
+                        cls.objects.create(prefix=prefix, last_value=start + count)
+                    return start + 1
+                except IntegrityError:
+                    # Another worker created the row first - take the next block from it
+                    cls.objects.filter(prefix=prefix).update(last_value=F('last_value') + count)
+
+            last_value = cls.objects.values_list('last_value', flat=True).get(prefix=prefix)
+        return last_value - count + 1
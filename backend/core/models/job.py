@@ -0,0 +1,82 @@
+from django.db import models
+from django.conf import settings
+
+
+class Job(models.Model):
+    """
+    A long-running admin action queued for the background worker
+    (python manage.py runjobs) instead of running inside the admin POST.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+
+    # Which admin action to replay: model label (e.g. 'core.student') + action method name
+    model_label = models.CharField(max_length=100)
+    action = models.CharField(max_length=100)
+    object_ids = models.JSONField(default=list, blank=True)
+    # Extra POST fields the action reads (e.g. the WhatsApp message text)
+    params = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        app_label = 'core'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.name} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('SUCCEEDED', 'FAILED')
+
+    @property
+    def percent(self):
+        """Progress as a whole percentage (0-100)"""
+        if self.status == 'SUCCEEDED':
+            return 100
+        if not self.total:
+            return 0
+        return min(100, int(self.progress * 100 / self.total))
+
+
+class JobResult(models.Model):
+    """
+    The file a finished job produced (PDF, Excel, ...). Kept in the database,
+    which the web and worker processes share, and only downloadable through
+    the permission-checked Jobs admin; it often holds student data.
+    """
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='result')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    content = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'core'
+
+    def __str__(self):
+        return self.filename
@@ -1,8 +1,8 @@
 from django.db import models
 from django.conf import settings
-from django.db.models import Max
 import datetime
 from django.core.exceptions import ValidationError
+from .id_sequence import IDSequence
 
 class Student(models.Model):
     """
@@ -65,6 +65,10 @@ class Student(models.Model):
         # CRITICAL: This tells Django exactly which app this belongs to
         app_label = 'core'
         ordering = ['student_id']
+        # Used by the search box on the students list (parent contact prefix)
+        indexes = [
+            models.Index(fields=['parent_guardian_contact'], name='student_parent_contact_idx'),
+        ]
     
     def clean(self):
         """Validate that date of birth is not today"""
@@ -73,27 +77,30 @@ class Student(models.Model):
                 'date_of_birth': 'Date of birth cannot be today.'
             })
     
+    @classmethod
+    def allocate_student_ids(cls, count=1, year=None):
+        """Reserve `count` new student IDs (e.g. NHC-2024-001) in one query"""
+        year = year or datetime.date.today().year
+        prefix = f'NHC-{year}'
+        first = IDSequence.allocate(prefix, count, seed=lambda: cls._highest_sequence(prefix))
+        return [f'{prefix}-{sequence:03d}' for sequence in range(first, first + count)]
+    
+    @classmethod
+    def _highest_sequence(cls, prefix):
+        """Highest sequence number already used for this prefix (only run once per year)"""
+        highest = 0
+        for student_id in cls.objects.filter(student_id__startswith=f'{prefix}-').values_list('student_id', flat=True):
+            try:
+                # Extract the sequence number from 'NHC-2024-001'
+                highest = max(highest, int(student_id.split('-')[-1]))
+            except (ValueError, IndexError):
+                continue
+        return highest
+    
     def save(self, *args, **kwargs):
         """Generate student ID and save"""
         if not self.student_id:
-            current_year = datetime.date.today().year
-            
-            # Find the highest sequence number for this year
-            # We use self.__class__ to avoid importing Student directly inside its own method
-            latest_id = self.__class__.objects.filter(
-                student_id__startswith=f'NHC-{current_year}-'
-            ).aggregate(Max('student_id'))['student_id__max']
-            
-            if latest_id:
-                try:
-                    # Extract the sequence number from 'NHC-2024-001' and increment
-                    sequence = int(latest_id.split('-')[-1]) + 1
-                except (ValueError, IndexError):
-                    sequence = 1
-            else:
-                sequence = 1
-            
-            self.student_id = f'NHC-{current_year}-{sequence:03d}'
+            self.student_id = self.allocate_student_ids(1)[0]
         
         # Run full validation before saving
         self.full_clean()
@@ -1,9 +1,9 @@
 from django.db import models
 from django.conf import settings
-from django.db.models import Max
 import datetime
 from .department import Department
 from .subject import Subject
+from .id_sequence import IDSequence
 
 class Teacher(models.Model):
     # Link to Django User for authentication
@@ -47,25 +47,35 @@ class Teacher(models.Model):
         ordering = ['teacher_id']
         verbose_name = "Teacher"
         verbose_name_plural = "Teachers"
+        # Used by the search box on the teachers list (phone number prefix)
+        indexes = [
+            models.Index(fields=['phone_number'], name='teacher_phone_idx'),
+        ]
+    
+    @classmethod
+    def allocate_teacher_ids(cls, count=1, year=None):
+        """Reserve `count` new teacher IDs (e.g. NHC-T-2025-001) in one query"""
+        year = year or datetime.date.today().year
+        prefix = f'NHC-T-{year}'
+        first = IDSequence.allocate(prefix, count, seed=lambda: cls._highest_sequence(prefix))
+        return [f'{prefix}-{sequence:03d}' for sequence in range(first, first + count)]
+    
+    @classmethod
+    def _highest_sequence(cls, prefix):
+        """Highest sequence number already used for this prefix (only run once per year)"""
+        highest = 0
+        for teacher_id in cls.objects.filter(teacher_id__startswith=f'{prefix}-').values_list('teacher_id', flat=True):
+            try:
+                highest = max(highest, int(teacher_id.split('-')[-1]))
+            except (ValueError, IndexError):
+                continue
+        return highest
     
     def save(self, *args, **kwargs):
         # Generate teacher ID only if it doesn't exist
         if not self.teacher_id:
-            current_year = datetime.date.today().year
-            
-            # Find the highest sequence number for this year
-            latest_id = Teacher.objects.filter(
-                teacher_id__startswith=f'NHC-T-{current_year}-'
-            ).aggregate(Max('teacher_id'))['teacher_id__max']
-            
-            if latest_id:
-                # Extract the sequence number and increment it
-                sequence = int(latest_id.split('-')[-1]) + 1
-            else:
-                sequence = 1
-            
             # Format: NHC-T-2025-001 (T for Teacher)
-            self.teacher_id = f'NHC-T-{current_year}-{sequence:03d}'
+            self.teacher_id = self.allocate_teacher_ids(1)[0]
         
         super().save(*args, **kwargs)
     
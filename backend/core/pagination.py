@@ -0,0 +1,106 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from .cache_keys import versioned_key
+
+
+class KeysetPage:
+    """
+    One page of a keyset (cursor) paginated list.
+
+    Pages are addressed by the key of the row they start after (or end before)
+    instead of an OFFSET, so the database seeks straight to the page through the
+    key's index and page 500 costs the same as page 1.
+    """
+
+    def __init__(self, object_list, key, has_next, has_previous):
+        self.object_list = object_list
+        # An empty page has no rows to take cursors from
+        self.has_next = has_next and bool(object_list)
+        self.has_previous = has_previous and bool(object_list)
+        self.next_cursor = getattr(object_list[-1], key) if self.has_next else None
+        self.previous_cursor = getattr(object_list[0], key) if self.has_previous else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def keyset_page(queryset, key, after=None, before=None, per_page=20):
+    """
+    Return the page of `queryset` (ordered by the unique field `key`) that
+    starts after the `after` cursor, or ends before the `before` cursor.
+    One query of per_page + 1 rows; the extra row tells whether there is more.
+
+    A cursor past either end of the list (stale after deletes, or from
+    before a search) gives the first page instead of an empty one.
+    """
+    if before:
+        rows = list(queryset.filter(**{f'{key}__lt': before}).order_by(f'-{key}')[:per_page + 1])
+        if not rows:
+            return keyset_page(queryset, key, per_page=per_page)
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return KeysetPage(rows, key, has_next=True, has_previous=has_more)
+
+    remaining = queryset.filter(**{f'{key}__gt': after}) if after else queryset
+    rows = list(remaining.order_by(key)[:per_page + 1])
+    if after and not rows:
+        return keyset_page(queryset, key, per_page=per_page)
+    has_more = len(rows) > per_page
+    return KeysetPage(rows[:per_page], key, has_next=has_more, has_previous=bool(after))
+
+
+def prefix_filter(field, prefix):
+    """
+    Q for `field` starting with `prefix`, written as a range so every database
+    can answer it from the field's B-tree index (SQLite's LIKE cannot).
+    """
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\uffff'})
+
+
+def _estimated_rows(model):
+    """Planner row estimate for a table on PostgreSQL; None elsewhere or before the first ANALYZE"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def list_count(queryset, *key_parts):
+    """
+    Total for a list page header.
+
+    With APPROXIMATE_LIST_COUNTS on, an unfiltered list on PostgreSQL uses the
+    planner's estimate instead of COUNT(*). Otherwise the exact count is cached
+    under the data version, so it is recounted only after the data changes.
+    """
+    filtered = queryset.query.has_filters()
+    if settings.APPROXIMATE_LIST_COUNTS and not filtered:
+        estimate = _estimated_rows(queryset.model)
+        if estimate is not None:
+            return estimate
+
+    digest = hashlib.md5(repr(key_parts).encode()).hexdigest()
+    key = versioned_key('count', queryset.model._meta.label_lower, digest)
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total)
+    return total
@@ -0,0 +1,337 @@
+import datetime
+import math
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.http import HttpResponse
+from pypdf import PdfWriter
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+ID_CARD_SIZE = (300, 200)
+
+# Rows fetched from the database per round trip while collecting PDF data
+PDF_CHUNK_SIZE = 2000
+
+# Below this many rows starting the process pool costs more than it saves
+PARALLEL_MIN_ROWS = 200
+
+
+def student_rows(queryset, chunk_size=PDF_CHUNK_SIZE):
+    """
+    Plain dicts with everything the student layouts draw.
+    Class and department are joined in the same query, and dicts (unlike model
+    instances) can be handed to worker processes without touching the database.
+    """
+    queryset = queryset.select_related('current_class__department')
+    return [
+        {
+            'student_id': student.student_id,
+            'full_name': student.full_name,
+            'date_of_birth': student.date_of_birth,
+            'date_of_admission': student.date_of_admission,
+            'current_class': str(student.current_class) if student.current_class else None,
+            'parent_guardian_name': student.parent_guardian_name,
+            'parent_guardian_contact': student.parent_guardian_contact,
+            'address': student.address,
+        }
+        for student in queryset.iterator(chunk_size=chunk_size)
+    ]
+
+
+def wrap_text(text, max_length):
+    """Split text into lines of at most max_length characters, breaking on spaces"""
+    if not text:
+        return ['']
+    words = text.split()
+    lines = []
+    current_line = []
+    current_length = 0
+
+    for word in words:
+        if current_length + len(word) + 1 <= max_length:
+            current_line.append(word)
+            current_length += len(word) + 1
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+            current_length = len(word)
+
+    if current_line:
+        lines.append(' '.join(current_line))
+
+    return lines
+
+
+class Layout(ABC):
+    """
+    How one kind of document is drawn.
+
+    Layouts with page_per_row = True start every row on a new page, so the
+    rows can be split into chunks, rendered in separate processes and the
+    resulting PDFs concatenated without changing the output.
+    """
+    pagesize = letter
+    page_per_row = False
+
+    def begin(self, p):
+        """Called once per canvas before any row is drawn"""
+
+    @abstractmethod
+    def draw(self, p, rows, offset):
+        """Draw rows; offset is the index of rows[0] in the whole document"""
+
+
+class StudentProfileLayout(Layout):
+    page_per_row = True
+
+    def draw(self, p, rows, offset):
+        for student in rows:
+            p.setFont("Helvetica-Bold", 16)
+            p.drawString(100, 750, "Student Profile Report")
+
+            # Student ID and Basic Info
+            p.setFont("Helvetica", 12)
+            y_position = 700
+            p.drawString(100, y_position, f"Student ID: {student['student_id']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Full Name: {student['full_name']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Date of Birth: {student['date_of_birth']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Admission Date: {student['date_of_admission']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Current Class: {student['current_class']}")
+
+            # Parent/Guardian Information
+            y_position -= 40
+            p.setFont("Helvetica-Bold", 14)
+            p.drawString(100, y_position, "Parent/Guardian Information:")
+            y_position -= 20
+            p.setFont("Helvetica", 12)
+            p.drawString(100, y_position, f"Name: {student['parent_guardian_name']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Contact: {student['parent_guardian_contact']}")
+
+            # Address
+            y_position -= 40
+            p.setFont("Helvetica-Bold", 14)
+            p.drawString(100, y_position, "Address:")
+            y_position -= 20
+            p.setFont("Helvetica", 12)
+            for line in wrap_text(student['address'], 60):
+                if y_position < 50:
+                    p.showPage()
+                    p.setFont("Helvetica", 12)
+                    y_position = 750
+                p.drawString(100, y_position, line)
+                y_position -= 15
+
+            p.showPage()
+
+
+class IDCardLayout(Layout):
+    pagesize = ID_CARD_SIZE
+    page_per_row = True
+
+    def begin(self, p):
+        # Everything that is the same on every card is drawn once into a form
+        # and referenced from each page, instead of being redrawn per student.
+        p.beginForm('card_template')
+        p.setStrokeColorRGB(0, 0, 0)  # Black border
+        p.rect(10, 10, 280, 180)
+
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(50, 160, "New Hope College")
+
+        # Student Photo Placeholder
+        p.setStrokeColorRGB(0.8, 0.8, 0.8)  # Light gray
+        p.rect(20, 70, 80, 100)
+        p.setFont("Helvetica", 10)
+        p.drawString(30, 125, "PHOTO")
+
+        # Barcode placeholder
+        p.rect(120, 30, 150, 40)
+
+        p.setFont("Helvetica-Oblique", 8)
+        p.drawString(20, 20, "Issued by New Hope College Administration")
+        p.endForm()
+
+    def draw(self, p, rows, offset):
+        valid_year = datetime.date.today().year
+        for student in rows:
+            p.doForm('card_template')
+
+            p.setFont("Helvetica", 10)
+            p.drawString(120, 140, f"ID: {student['student_id']}")
+            p.drawString(120, 120, f"Name: {student['full_name']}")
+            p.drawString(120, 100, f"Class: {student['current_class']}")
+            p.drawString(120, 80, f"Valid: {valid_year}")
+
+            p.setFont("Helvetica", 8)
+            p.drawString(170, 50, f"BARCODE: {student['student_id']}")
+
+            p.showPage()  # New page for next ID card
+
+
+class StudentListLayout(Layout):
+    def draw(self, p, rows, offset):
+        p.setFont("Helvetica-Bold", 16)
+        p.drawString(100, 750, "New Hope College - Student Report")
+        p.setFont("Helvetica", 10)
+        p.drawString(400, 750, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        p.line(100, 735, 500, 735)
+
+        y_position = 700
+        p.setFont("Helvetica", 12)
+        for student in rows:
+            if y_position < 100:  # New page if running out of space
+                p.showPage()
+                p.setFont("Helvetica", 12)
+                y_position = 750
+
+            p.drawString(100, y_position, f"Student ID: {student['student_id']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Name: {student['full_name']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Class: {student['current_class']}")
+            y_position -= 20
+            p.drawString(100, y_position, f"Admission Date: {student['date_of_admission']}")
+            y_position -= 30  # Extra space between students
+
+
+class MeetingScheduleLayout(Layout):
+    first_slot = datetime.time(9, 0)
+    slot_minutes = 15
+
+    def draw(self, p, rows, offset):
+        p.setFont("Helvetica-Bold", 16)
+        p.drawString(100, 750, "Parent-Teacher Meeting Schedule")
+        p.setFont("Helvetica", 10)
+        p.drawString(400, 750, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d')}")
+
+        start = datetime.datetime.combine(datetime.date.today(), self.first_slot)
+        y_position = 700
+        for index, student in enumerate(rows, start=offset):
+            if y_position < 100:
+                p.showPage()
+                y_position = 750
+
+            time_slot = (start + datetime.timedelta(minutes=self.slot_minutes * index)).time()
+            p.setFont("Helvetica-Bold", 12)
+            p.drawString(100, y_position, f"{time_slot.strftime('%I:%M %p')} - {student['full_name']}")
+            y_position -= 15
+            p.setFont("Helvetica", 11)
+            p.drawString(100, y_position, f"Student ID: {student['student_id']}")
+            y_position -= 15
+            p.drawString(100, y_position, f"Class: {student['current_class']}")
+            y_position -= 15
+            p.drawString(100, y_position, f"Parent: {student['parent_guardian_name']}")
+            y_position -= 15
+            p.drawString(100, y_position, f"Contact: {student['parent_guardian_contact']}")
+            y_position -= 30
+
+
+class FeePaymentLayout(Layout):
+    def draw(self, p, rows, offset):
+        p.setFont("Helvetica-Bold", 16)
+        p.drawString(100, 750, "New Hope College - Fee Payment Report")
+
+        y_position = 700
+        p.setFont("Helvetica", 12)
+        for student in rows:
+            if y_position < 100:
+                p.showPage()
+                p.setFont("Helvetica", 12)
+                y_position = 750
+
+            p.drawString(100, y_position, f"Student: {student['full_name']} ({student['student_id']})")
+            y_position -= 20
+            p.drawString(100, y_position, f"Class: {student['current_class']}")
+            y_position -= 20
+            p.drawString(100, y_position, "Fee Status: [To be implemented with Fee model]")
+            y_position -= 40
+
+
+# Layouts are looked up by name so worker processes only receive strings and dicts
+LAYOUTS = {
+    'student_profile': StudentProfileLayout(),
+    'id_card': IDCardLayout(),
+    'student_list': StudentListLayout(),
+    'meeting_schedule': MeetingScheduleLayout(),
+    'fee_payment': FeePaymentLayout(),
+}
+
+_pool = None
+
+
+def _get_pool():
+    """
+    The process pool is started on first use and reused for later documents.
+    Workers are spawned, not forked: forking the multi-threaded Daphne process
+    could copy locks held by its other threads.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _pool
+
+
+def _discard_pool():
+    """Drop a pool whose worker died, so the next document starts a new one"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _render_chunk(layout_name, rows, offset=0):
+    layout = LAYOUTS[layout_name]
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=layout.pagesize)
+    layout.begin(p)
+    layout.draw(p, rows, offset)
+    p.save()
+    return buffer.getvalue()
+
+
+def _render_parallel(layout_name, rows, processes):
+    chunk_size = math.ceil(len(rows) / processes)
+    futures = [
+        _get_pool().submit(_render_chunk, layout_name, rows[start:start + chunk_size], start)
+        for start in range(0, len(rows), chunk_size)
+    ]
+
+    writer = PdfWriter()
+    for future in futures:
+        writer.append(BytesIO(future.result()))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def render_bytes(layout_name, rows):
+    """Render rows with the named layout, in parallel when PDF_RENDER_PROCESSES allows it"""
+    processes = settings.PDF_RENDER_PROCESSES
+    if processes > 1 and LAYOUTS[layout_name].page_per_row and len(rows) >= PARALLEL_MIN_ROWS:
+        try:
+            return _render_parallel(layout_name, rows, processes)
+        except BrokenProcessPool:
+            # A worker crashed or was killed (e.g. out of memory): render this
+            # document in-process and start a fresh pool for the next one
+            _discard_pool()
+    return _render_chunk(layout_name, rows)
+
+
+def render_pdf(layout_name, rows, filename):
+    """Render rows with the named layout and return the PDF as a download"""
+    response = HttpResponse(render_bytes(layout_name, rows), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,117 @@
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .cache_keys import bump_data_version
+from .models import Student, Class
+
+# Each level and the class name that follows it, in school order.
+# The matched text is replaced so the rest of the name (stream letter etc.) is kept:
+# "Form 1A" -> "Form 2A", "Form 5 Science" -> "Lower Sixth Science".
+PROGRESSION = [
+    (re.compile(r'Form\s*1', re.IGNORECASE), 'Form 2'),
+    (re.compile(r'Form\s*2', re.IGNORECASE), 'Form 3'),
+    (re.compile(r'Form\s*3', re.IGNORECASE), 'Form 4'),
+    (re.compile(r'Form\s*4', re.IGNORECASE), 'Form 5'),
+    (re.compile(r'Form\s*5', re.IGNORECASE), 'Lower Sixth'),
+    (re.compile(r'Lower\s*Sixth', re.IGNORECASE), 'Upper Sixth'),
+]
+
+
+def next_class_name(name):
+    """Return (rank, next class name) for a class name, or (None, None) for final-year classes"""
+    for rank, (pattern, replacement) in enumerate(PROGRESSION):
+        if pattern.search(name):
+            return rank, pattern.sub(replacement, name, count=1)
+    return None, None
+
+
+def _normalise(name):
+    """'Lower Sixth A', 'LowerSixth A' and 'lower sixth a' are the same class name"""
+    return re.sub(r'\s+', '', name).lower()
+
+
+class PromotionPlan:
+    """
+    Class-to-next-class mapping for a Class queryset, built with one query
+    per academic year, plus the number of students each move affects.
+    apply() then moves students with one UPDATE per mapping.
+    """
+
+    def __init__(self, classes, student_ids=None):
+        # Department is part of the class name on the preview page
+        self.classes = list(classes.select_related('department'))
+        self.student_ids = list(student_ids) if student_ids is not None else None
+        self.steps = []       # (rank, source class, target class)
+        self.unmatched = []   # source classes with no next class
+        self._build()
+        self.counts = self._count_students()
+
+    def _build(self):
+        years = {class_obj.academic_year for class_obj in self.classes}
+        candidates = defaultdict(list)
+        for class_obj in Class.objects.filter(academic_year__in=years).select_related('department'):
+            candidates[(class_obj.academic_year, _normalise(class_obj.name))].append(class_obj)
+
+        for source in self.classes:
+            rank, target_name = next_class_name(source.name)
+            matches = candidates.get((source.academic_year, _normalise(target_name)), []) if target_name else []
+            # Prefer the next class in the same department, otherwise accept an unambiguous match
+            same_department = [c for c in matches if c.department_id == source.department_id]
+            target = (same_department or matches)[0] if (same_department or len(matches) == 1) else None
+            if target:
+                self.steps.append((rank, source, target))
+            else:
+                self.unmatched.append(source)
+
+    def _students(self):
+        students = Student.objects.all()
+        if self.student_ids is not None:
+            students = students.filter(pk__in=self.student_ids)
+        return students
+
+    def _count_students(self):
+        source_ids = [class_obj.id for class_obj in self.classes]
+        rows = (
+            self._students()
+            .filter(current_class_id__in=source_ids)
+            .values('current_class_id')
+            .annotate(total=Count('id'))
+        )
+        return {row['current_class_id']: row['total'] for row in rows}
+
+    def preview(self):
+        """Rows for the dry-run page: source, target (None when unmatched) and student count"""
+        rows = [
+            {'source': source, 'target': target, 'students': self.counts.get(source.id, 0)}
+            for _, source, target in self.steps
+        ]
+        rows += [
+            {'source': source, 'target': None, 'students': self.counts.get(source.id, 0)}
+            for source in self.unmatched
+        ]
+        return rows
+
+    @property
+    def total_students(self):
+        return sum(self.counts.get(source.id, 0) for _, source, _ in self.steps)
+
+    def apply(self):
+        """Move students to their next class; returns the number of students promoted"""
+        grouped = defaultdict(list)
+        for rank, source, target in self.steps:
+            grouped[(rank, target.id)].append(source.id)
+
+        promoted = 0
+        with transaction.atomic():
+            # Highest level first, so Form 2 is emptied into Form 3 before
+            # Form 1 students arrive in Form 2 and nobody is promoted twice.
+            for (rank, target_id), source_ids in sorted(grouped.items(), key=lambda item: -item[0][0]):
+                promoted += self._students().filter(current_class_id__in=source_ids).update(
+                    current_class_id=target_id
+                )
+        # queryset.update() sends no signals
+        bump_data_version()
+        return promoted
@@ -0,0 +1,29 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_keys import bump_data_version
+from .models import Student, Teacher, Class, Department, Subject
+
+
+# Changes to these models make cached counts, dashboards and list pages stale.
+# Bulk operations (bulk_create, queryset.update) do not send these signals;
+# code using them calls bump_data_version() itself.
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Class)
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Class)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Subject)
+def invalidate_cached_data(sender, **kwargs):
+    bump_data_version()
+
+
+@receiver(m2m_changed, sender=Class.teachers.through)
+@receiver(m2m_changed, sender=Teacher.subjects.through)
+def invalidate_cached_assignments(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_data_version()
@@ -1,3 +1,174 @@
-from django.test import TestCase
+import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .models import Class, Department, IDSequence, Job, JobResult, Student
+from .pagination import keyset_page
+from .promotion import PromotionPlan
+
+
+class KeysetPageTests(TestCase):
+    """Keyset pagination over usernames user-00 .. user-24 (25 rows, pages of 10)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        User.objects.bulk_create([User(username=f'user-{number:02}', password='!') for number in range(25)])
+        cls.users = User.objects.all()
+
+    def page(self, **cursors):
+        return keyset_page(self.users, 'username', per_page=10, **cursors)
+
+    def names(self, page):
+        return [user.username for user in page]
+
+    def test_first_page(self):
+        page = self.page()
+        self.assertEqual(self.names(page), [f'user-{number:02}' for number in range(10)])
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+        self.assertEqual(page.next_cursor, 'user-09')
+        self.assertIsNone(page.previous_cursor)
+
+    def test_next_and_previous_pages(self):
+        page = self.page(after='user-09')
+        self.assertEqual(self.names(page)[0], 'user-10')
+        self.assertEqual((page.previous_cursor, page.next_cursor), ('user-10', 'user-19'))
+
+        page = self.page(before='user-10')
+        self.assertEqual(self.names(page), [f'user-{number:02}' for number in range(10)])
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+    def test_last_page(self):
+        page = self.page(after='user-19')
+        self.assertEqual(self.names(page), [f'user-{number:02}' for number in range(20, 25)])
+        self.assertFalse(page.has_next)
+        self.assertTrue(page.has_previous)
+
+    def test_cursor_past_the_end_gives_first_page(self):
+        for cursors in ({'after': 'zzz'}, {'before': 'a'}):
+            page = self.page(**cursors)
+            self.assertEqual(self.names(page)[0], 'user-00')
+            self.assertFalse(page.has_previous)
+            self.assertEqual(page.next_cursor, 'user-09')
+
+    def test_empty_list_has_no_cursors(self):
+        page = keyset_page(self.users.none(), 'username', after='user-05', per_page=10)
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_other_pages())
+        self.assertIsNone(page.next_cursor)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_list_views_accept_stale_cursors(self):
+        User = get_user_model()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        for url in ('/students/?after=ZZZ', '/students/?before=A', '/teachers/?after=ZZZ', '/students/?q=none&after=A'):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+
+class JobResultDownloadTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='pw', is_staff=True)
+        self.owner.user_permissions.add(Permission.objects.get(codename='view_job'))
+        self.job = Job.objects.create(name='Export', model_label='core.student', action='export', status='SUCCEEDED', created_by=self.owner)
+        JobResult.objects.create(job=self.job, filename='students.xlsx', content=b'data')
+        self.url = reverse('admin:core_job_result', args=[self.job.pk])
+
+    def test_creator_downloads_result(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'data')
+        self.assertIn('students.xlsx', response['Content-Disposition'])
+        self.assertEqual(self.client.get(reverse('admin:core_job_status', args=[self.job.pk])).json()['result_url'], self.url)
+
+    def test_other_staff_cannot_download(self):
+        User = get_user_model()
+        other = User.objects.create_user('other', password='pw', is_staff=True)
+        other.user_permissions.add(Permission.objects.get(codename='view_job'))
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertIsNone(self.client.get(reverse('admin:core_job_status', args=[self.job.pk])).json()['result_url'])
+
+
+class PromotionPlanTests(TestCase):
+    """Form 1A -> Form 2A -> Form 3A in one department; Form 3A has no next class"""
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='GENERAL')
+        cls.form1, cls.form2, cls.form3 = [
+            Class.objects.create(name=f'Form {level}A', department=department, academic_year='2024/2025')
+            for level in (1, 2, 3)
+        ]
+        User = get_user_model()
+        cls.students = {}
+        for class_obj in (cls.form1, cls.form2):
+            user = User.objects.create_user(username=f'student-{class_obj.pk}', password='!')
+            cls.students[class_obj.pk] = Student.objects.create(
+                user=user, full_name=f'Student {class_obj.name}',
+                date_of_birth=datetime.date(2010, 1, 1), current_class=class_obj,
+            )
+
+    def plan(self):
+        return PromotionPlan(Class.objects.filter(pk__in=[self.form1.pk, self.form2.pk, self.form3.pk]))
+
+    def test_maps_each_class_to_the_next(self):
+        plan = self.plan()
+        self.assertEqual(
+            [(source, target) for _, source, target in plan.steps],
+            [(self.form1, self.form2), (self.form2, self.form3)],
+        )
+        self.assertEqual(plan.unmatched, [self.form3])
+        self.assertEqual(plan.total_students, 2)
+
+    def test_apply_promotes_higher_levels_first(self):
+        # Form 1 students must not be moved on again once they reach Form 2
+        self.assertEqual(self.plan().apply(), 2)
+        self.assertEqual(
+            {student.full_name: student.current_class for student in Student.objects.select_related('current_class')},
+            {'Student Form 1A': self.form2, 'Student Form 2A': self.form3},
+        )
+
+    def test_preview_does_not_query_per_class(self):
+        rows = self.plan().preview()
+        with self.assertNumQueries(0):
+            [str(row['source']) for row in rows]
+
+
+class IDSequenceAllocateTests(TransactionTestCase):
+    """Blocks handed out by IDSequence.allocate while other allocations run"""
+
+    def test_concurrent_allocations_do_not_overlap(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite fails on table locks instead of waiting for them")
+
+        def allocate(count):
+            try:
+                return IDSequence.allocate('TEST', count)
+            finally:
+                connection.close()
+
+        counts = [1, 2, 3, 4] * 5
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            firsts = list(executor.map(allocate, counts))
+
+        numbers = [first + offset for first, count in zip(firsts, counts) for offset in range(count)]
+        self.assertEqual(sorted(numbers), list(range(1, sum(counts) + 1)))
+        self.assertEqual(IDSequence.objects.get(prefix='TEST').last_value, sum(counts))
+
+    def test_lost_creation_race_takes_the_next_block(self):
+        def seed():
+            # Another worker creates the row between our UPDATE and INSERT
+            IDSequence.objects.create(prefix='TEST', last_value=10)
+            return 0
+
+        self.assertEqual(IDSequence.allocate('TEST', 5, seed=seed), 11)
+        self.assertEqual(IDSequence.allocate('TEST'), 16)
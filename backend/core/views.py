@@ -1,16 +1,48 @@
 from datetime import datetime
 from django.shortcuts import render
 from django.views.generic import TemplateView
+from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.paginator import Paginator
+from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_cookie
+from backend.core.cache_keys import data_version
+from backend.core.pagination import keyset_page, list_count, prefix_filter
 from backend.core.models import Student, Teacher, Class, Department, Subject
+
+# Seconds the static public pages are served from the cache
+PUBLIC_PAGE_TIMEOUT = 60 * 15
+
+# The navigation in base.html differs for logged-in users, so the cached copy
+# must vary on the session cookie (added inside cache_page so it is part of the key)
+cache_public_page = [cache_page(PUBLIC_PAGE_TIMEOUT), vary_on_cookie]
+
+# Seconds a rendered list table is kept; model changes invalidate it sooner
+LIST_CACHE_TIMEOUT = 60 * 5
+
+# Rows per page on the students and teachers lists
+LIST_PAGE_SIZE = 20
+
+
+class CachedListMixin:
+    """
+    Adds what the list templates need to key their {% cache %} fragments:
+    the current data version (bumped by model signals) and the timeout.
+    The fragments are also keyed by user, since the tables show per-user actions.
+    """
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_version'] = data_version()
+        context['list_cache_timeout'] = LIST_CACHE_TIMEOUT
+        return context
+
 # --- Public Views ---
 
+@method_decorator(cache_public_page, name='dispatch')
 class HomeView(TemplateView):
     """Main homepage view"""
-    template_name = 'core/home.html'
+    template_name = 'home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -18,18 +50,20 @@ class HomeView(TemplateView):
         context['welcome_message'] = 'Welcome to New Hope School Management System'
         return context
 
+@method_decorator(cache_public_page, name='dispatch')
 class AboutView(TemplateView):
     """About page view"""
-    template_name = 'core/about.html'
+    template_name = 'about.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['page_title'] = 'About Us - New Hope System'
         return context
 
+@method_decorator(cache_public_page, name='dispatch')
 class ContactView(TemplateView):
     """Contact page view"""
-    template_name = 'core/contact.html'
+    template_name = 'contact.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -46,7 +80,7 @@ class ContactView(TemplateView):
 @method_decorator(login_required, name='dispatch')
 class DashboardView(TemplateView):
     """User dashboard view"""
-    template_name = 'core/dashboard.html'
+    template_name = 'dashboard.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -54,101 +88,130 @@ class DashboardView(TemplateView):
         context['user'] = self.request.user
         return context
 
-class StudentsListView(LoginRequiredMixin, TemplateView):
+class StudentsListView(LoginRequiredMixin, CachedListMixin, TemplateView):
     """List all students"""
-    template_name = 'core/students.html'
+    template_name = 'students.html'
     login_url = '/admin/login/'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        students = Student.objects.all().order_by('student_id')
+        query = self.request.GET.get('q', '').strip()
+        students = Student.objects.select_related('user', 'current_class__department')
+        if query:
+            # IDs and contacts match by prefix through their indexes; names match anywhere
+            students = students.filter(
+                prefix_filter('student_id', query.upper())
+                | prefix_filter('parent_guardian_contact', query)
+                | Q(full_name__icontains=query)
+            )
         
-        paginator = Paginator(students, 20)
-        page = self.request.GET.get('page')
-        student_list = paginator.get_page(page)
+        # Keyset paging on student_id: ?after=<last id shown> / ?before=<first id shown>
+        student_list = keyset_page(
+            students, 'student_id',
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+            per_page=LIST_PAGE_SIZE,
+        )
         
         context.update({
             'page_title': 'Students - New Hope System',
             'students': student_list,
-            'total_students': students.count(),
+            'total_students': list_count(students, query),
+            'query': query,
         })
         return context
 
-class TeachersListView(LoginRequiredMixin, TemplateView):
+class TeachersListView(LoginRequiredMixin, CachedListMixin, TemplateView):
     """List all teachers"""
-    template_name = 'core/teachers.html'
+    template_name = 'teachers.html'
     login_url = '/admin/login/'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        teachers = Teacher.objects.all().order_by('teacher_id')
+        query = self.request.GET.get('q', '').strip()
+        teachers = Teacher.objects.select_related('department').prefetch_related('subjects')
+        if query:
+            teachers = teachers.filter(
+                prefix_filter('teacher_id', query.upper())
+                | prefix_filter('phone_number', query)
+                | Q(full_name__icontains=query)
+            )
         
-        paginator = Paginator(teachers, 20)
-        page = self.request.GET.get('page')
-        teacher_list = paginator.get_page(page)
+        # Keyset paging on teacher_id: ?after=<last id shown> / ?before=<first id shown>
+        teacher_list = keyset_page(
+            teachers, 'teacher_id',
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+            per_page=LIST_PAGE_SIZE,
+        )
         
         context.update({
             'page_title': 'Teachers - New Hope System',
             'teachers': teacher_list,
-            'total_teachers': teachers.count(),
+            'total_teachers': list_count(teachers, query),
+            'query': query,
         })
         return context
 
-class ClassesListView(LoginRequiredMixin, TemplateView):
+class ClassesListView(LoginRequiredMixin, CachedListMixin, TemplateView):
     """List all classes"""
-    template_name = 'core/classes.html'
+    template_name = 'classes.html'
     login_url = '/admin/login/'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        classes = Class.objects.all().order_by('name')
+        classes = Class.objects.select_related('department').order_by('name')
         
+        # Querysets and counts stay lazy (the template calls classes.count),
+        # so nothing is queried when the cached fragment is used
         context.update({
             'page_title': 'Classes - New Hope System',
             'classes': classes,
-            'total_classes': classes.count(),
+            'total_classes': classes.count,
         })
         return context
 
-class DepartmentsListView(LoginRequiredMixin, TemplateView):
+class DepartmentsListView(LoginRequiredMixin, CachedListMixin, TemplateView):
     """List all departments"""
-    template_name = 'core/departments.html'
+    template_name = 'departments.html'
     login_url = '/admin/login/'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        departments = Department.objects.all().order_by('name')
+        # Teacher/class/student counts are annotated in the same query.
+        # Left lazy so a cached fragment costs no query; the template counts it with |length.
+        departments = Department.objects.with_stats().order_by('name')
         
         context.update({
             'page_title': 'Departments - New Hope System',
             'departments': departments,
-            'total_departments': departments.count(),
         })
         return context
 
-class ReportsView(LoginRequiredMixin, TemplateView):
+class ReportsView(LoginRequiredMixin, CachedListMixin, TemplateView):
     """Reports dashboard"""
-    template_name = 'core/reports.html'
+    template_name = 'reports.html'
     login_url = '/admin/login/'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # Counts are passed uncalled; the template only runs them when its cached fragment is missing
         context.update({
             'page_title': 'Reports & Analytics - New Hope System',
-            'student_count': Student.objects.count(),
-            'teacher_count': Teacher.objects.count(),
-            'class_count': Class.objects.count(),
-            'department_count': Department.objects.count(),
-            'subject_count': Subject.objects.count(),
-            'recent_students': Student.objects.all().order_by('-date_of_admission')[:5],
+            'student_count': Student.objects.count,
+            'teacher_count': Teacher.objects.count,
+            'class_count': Class.objects.count,
+            'department_count': Department.objects.count,
+            'subject_count': Subject.objects.count,
+            'recent_students': Student.objects.select_related('current_class').order_by('-date_of_admission')[:5],
         })
         return context
 
 # --- Utility & Error Views ---
 
 def test_static(request):
-    return render(request, 'core/test_static.html')
+    return render(request, 'test_static.html')
 
 def handler404(request, exception):
     return render(request, '404.html', status=404)
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+import dj_database_url
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,8 +12,21 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-*d8dav!8&zpvpfo8+!-pt
 
 DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
+# Default for maintenance mode; `python manage.py maintenance on|off` switches it at runtime
 MAINTENANCE_MODE = os.environ.get('MAINTENANCE_MODE', 'False') == 'True'
 
+# Queue heavy admin actions for `python manage.py runjobs` instead of running them in the request
+BACKGROUND_JOBS = os.environ.get('BACKGROUND_JOBS', 'False') == 'True'
+
+# Worker processes for large PDF batches (ID cards, profiles); 0 or 1 renders in-process
+PDF_RENDER_PROCESSES = int(os.environ.get('PDF_RENDER_PROCESSES', '0'))
+
+# Milliseconds chat messages wait to be inserted together (write-behind); 0 saves each one directly
+CHAT_WRITE_BEHIND_MS = int(os.environ.get('CHAT_WRITE_BEHIND_MS', '0'))
+
+# Use the database's row estimate for unfiltered list totals (PostgreSQL only)
+APPROXIMATE_LIST_COUNTS = os.environ.get('APPROXIMATE_LIST_COUNTS', 'False') == 'True'
+
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '.onrender.com']
 
 RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
@@ -40,13 +54,15 @@ AUTH_USER_MODEL = 'core.User'
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', 
+    # Before sessions and auth, so maintenance responses touch no database
+    'departments.middleware.MaintenanceModeMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'departments.middleware.UserProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # Removed non-existent middleware: 'backend.middleware.MaintenanceModeMiddleware'
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -62,13 +78,62 @@ CHANNEL_LAYERS = {
     },
 }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Shared cache for dashboard metrics and cached pages/fragments.
+# Reuses the channel layer's Redis when REDIS_URL is set, so every Daphne worker
+# sees the same entries; falls back to per-process local memory (tests, local dev).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'newhope',
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'newhope',
+            'TIMEOUT': 300,
+        }
     }
+
+# DATABASE_URL (e.g. PostgreSQL on Render) when set, the local SQLite file otherwise
+DATABASES = {
+    'default': dj_database_url.config(
+        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+    )
 }
 
+# Account passwords use the first (Django's default); role secrets use the lighter
+# tier in departments/hashers.py, and are re-hashed to it on their next use
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'departments.hashers.RoleSecretHasher',
+]
+
+# PBKDF2 rounds for stream/department/floor secrets (account passwords keep Django's default)
+ROLE_SECRET_ITERATIONS = int(os.environ.get('ROLE_SECRET_ITERATIONS', '100000'))
+
+# ModelBackend that rejects locked-out logins before any password is hashed
+AUTHENTICATION_BACKENDS = [
+    'departments.backends.LoginRateLimitBackend',
+]
+
+# Failed logins allowed per username and per client IP within the sliding window (seconds)
+LOGIN_ATTEMPTS_PER_USERNAME = int(os.environ.get('LOGIN_ATTEMPTS_PER_USERNAME', '5'))
+LOGIN_ATTEMPTS_PER_IP = int(os.environ.get('LOGIN_ATTEMPTS_PER_IP', '20'))
+LOGIN_ATTEMPT_WINDOW = int(os.environ.get('LOGIN_ATTEMPT_WINDOW', '900'))
+
+# Reverse proxies in front of the app that append to X-Forwarded-For (1 on Render,
+# set in render.yaml). Forwarded requests get no per-IP limit while it is 0
+LOGIN_PROXY_HOPS = int(os.environ.get('LOGIN_PROXY_HOPS', '0'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -1,9 +1,18 @@
 from django.contrib import admin
-from .models import Stream, UserProfile, Floor, Message, UserStatus
+from .forms import AdminSiteLoginForm
+from .models import Stream, UserProfile, Floor, Message, UserStatus, Conversation, ChatUpload, ChatGroup, ChatGroupMember, GroupMessage
+
+# Same login rate limit message as the staff login pages
+admin.site.login_form = AdminSiteLoginForm
 
 admin.site.register(Stream)
 admin.site.register(UserProfile)
 admin.site.register(Floor)
 admin.site.register(Message)
 admin.site.register(UserStatus)
+admin.site.register(Conversation)
+admin.site.register(ChatUpload)
+admin.site.register(ChatGroup)
+admin.site.register(ChatGroupMember)
+admin.site.register(GroupMessage)
 # Note: Department is now registered in core.admin, so we removed it from here
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DepartmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'departments'
+
+    def ready(self):
+        # Presence rows for new users
+        from . import signals  # noqa: F401
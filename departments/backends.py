@@ -0,0 +1,22 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+from . import login_limits
+
+
+class LoginRateLimitBackend(ModelBackend):
+    """
+    ModelBackend that first checks the failed-login limits: while the
+    username or IP is over its limit, authenticate() stops with
+    PermissionDenied before any password is hashed. Failures are counted
+    by the user_login_failed signal (signals.py).
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if request is not None:
+            seconds = login_limits.retry_after(request, username)
+            if seconds:
+                # Read by the login forms for their error message
+                request.login_retry_after = seconds
+                raise PermissionDenied
+        return super().authenticate(request, username=username, password=password, **kwargs)
@@ -0,0 +1,149 @@
+import asyncio
+import math
+import random
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+
+from . import consumers, presence
+from .message_buffer import MessageBuffer
+from .models import UserProfile
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class QueryCounter:
+    """
+    Database execute wrapper (connection.execute_wrapper) counting the
+    queries and writes made while `counting` is on.
+    """
+
+    def __init__(self):
+        self.counting = False
+        self.queries = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.counting:
+            self.queries += 1
+            self.writes += sql.lstrip().upper().startswith(WRITE_STATEMENTS)
+        return execute(sql, params, many, context)
+
+
+def percentiles(samples):
+    """p50/p99/max of a list of seconds, in milliseconds (nearest rank)"""
+    if not samples:
+        return {'p50': None, 'p99': None, 'max': None}
+    ordered = sorted(samples)
+
+    def rank(fraction):
+        return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)] * 1000
+
+    return {
+        'p50': round(rank(0.50), 2),
+        'p99': round(rank(0.99), 2),
+        'max': round(ordered[-1] * 1000, 2),
+    }
+
+
+def create_users(count):
+    """
+    Benchmark users with the profile chat recipients need, inserted in
+    one query each (no password hashing)
+    """
+    User = get_user_model()
+    User.objects.bulk_create(
+        [User(username=f'chat-benchmark-{number}', password='!') for number in range(count)],
+        batch_size=500,
+    )
+    users = list(User.objects.filter(username__startswith='chat-benchmark-').order_by('id'))
+    UserProfile.objects.bulk_create([UserProfile(user=user, role='Teacher') for user in users], batch_size=500)
+    return users
+
+
+async def _drain(communicator):
+    # Skip frames nobody waits for (mostly online notifications)
+    while not await communicator.receive_nothing(timeout=0.01, interval=0.001):
+        await communicator.receive_output()
+
+
+async def _receive(communicator, frame_type, timeout):
+    while True:
+        frame = await communicator.receive_json_from(timeout)
+        if frame.get('type') == 'message_error':
+            raise RuntimeError(f"Message rejected: {frame['error']}")
+        if frame.get('type') == frame_type:
+            return frame
+
+
+async def _connect(user):
+    communicator = WebsocketCommunicator(consumers.ChatConsumer.as_asgi(), '/ws/chat/')
+    communicator.scope['user'] = user
+    started = time.perf_counter()
+    connected, _ = await communicator.connect()
+    if not connected:
+        raise RuntimeError(f'{user.username} could not connect')
+    return communicator, time.perf_counter() - started
+
+
+async def _round_trip(sender, receiver, receiver_id, text, timeout):
+    started = time.perf_counter()
+    await sender.send_json_to({'message': text, 'receiver_id': receiver_id})
+    # A rejected message is reported to the sender only
+    await _receive(sender, 'message_ack', timeout)
+    await _receive(receiver, 'private_message', timeout)
+    return time.perf_counter() - started
+
+
+async def run_benchmark(users, rounds, counter, write_behind_ms=0, timeout=10):
+    """
+    Connect every user's socket through ChatConsumer, then send `rounds`
+    rounds of private messages (users paired at random, all pairs at once)
+    and measure what it cost. Returns the report as a dict.
+
+    Run it with async_to_sync: the consumer's database calls then go back to
+    the calling thread, where `counter` is installed on the connection.
+    """
+    previous_buffer, previous_grace = consumers.message_buffer, presence.OFFLINE_GRACE
+    consumers.message_buffer = MessageBuffer(write_behind_ms) if write_behind_ms > 0 else None
+    presence.OFFLINE_GRACE = 0
+    try:
+        started = time.perf_counter()
+        connected = await asyncio.gather(*[_connect(user) for user in users])
+        connect_seconds = time.perf_counter() - started
+        communicators = [communicator for communicator, _ in connected]
+        await asyncio.gather(*[_drain(communicator) for communicator in communicators])
+
+        round_trips = []
+        pairs_per_round = len(users) // 2
+        counter.counting = True
+        started = time.perf_counter()
+        for number in range(rounds):
+            order = random.sample(range(len(users)), len(users))
+            pairs = [(order[2 * i], order[2 * i + 1]) for i in range(pairs_per_round)]
+            round_trips += await asyncio.gather(*[
+                _round_trip(communicators[a], communicators[b], users[b].id, f'benchmark {number}', timeout)
+                for a, b in pairs
+            ])
+        messaging_seconds = time.perf_counter() - started
+        counter.counting = False
+
+        await asyncio.gather(*[communicator.disconnect() for communicator in communicators])
+        # Let the offline announcements (grace period 0) finish
+        await asyncio.sleep(0.05)
+    finally:
+        consumers.message_buffer, presence.OFFLINE_GRACE = previous_buffer, previous_grace
+
+    messages = len(round_trips)
+    return {
+        'users': len(users),
+        'messages': messages,
+        'write_behind_ms': write_behind_ms,
+        'connect_ms': percentiles([seconds for _, seconds in connected]),
+        'connect_all_seconds': round(connect_seconds, 3),
+        'round_trip_ms': percentiles(round_trips),
+        'messages_per_second': round(messages / messaging_seconds, 1) if messaging_seconds else None,
+        'db_queries_per_message': round(counter.queries / messages, 2) if messages else None,
+        'db_writes_per_message': round(counter.writes / messages, 2) if messages else None,
+    }
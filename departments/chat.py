@@ -0,0 +1,208 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.html import strip_tags
+
+from .models import Message, Conversation
+
+# Messages returned per history request (first page and each older page)
+HISTORY_PAGE_SIZE = 50
+
+# Cached ids of users who can receive messages; cleared when a user is saved or deleted
+CHAT_USER_IDS_KEY = 'chat:user_ids'
+CHAT_USER_IDS_TIMEOUT = 300
+
+
+def conversation_history(user_id, other_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    The newest `limit` messages between two users with id < `before`,
+    oldest first, plus whether older messages remain.
+
+    Each direction is read separately through the (sender, receiver, id) index,
+    newest first with a LIMIT, and the two short lists are merged here. The cost
+    is two index seeks no matter how long the conversation is.
+    """
+    def one_direction(sender_id, receiver_id):
+        messages = Message.objects.filter(sender_id=sender_id, receiver_id=receiver_id)
+        if before:
+            messages = messages.filter(id__lt=before)
+        return list(messages.order_by('-id')[:limit + 1])
+
+    newest_first = sorted(
+        one_direction(user_id, other_id) + one_direction(other_id, user_id),
+        key=lambda message: message.id,
+        reverse=True,
+    )
+    has_more = len(newest_first) > limit
+    return newest_first[:limit][::-1], has_more
+
+
+def message_to_dict(message):
+    """JSON-ready form of a message, matching what the chat templates render"""
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'receiver_id': message.receiver_id,
+        'content': message.content,
+        'file_url': message.file.url if message.file else None,
+        'timestamp': message.timestamp.isoformat(),
+        'is_read': message.is_read,
+    }
+
+
+def preview_text(message, length=255):
+    """Plain-text preview of a message for the inbox (uploads are sent as HTML)"""
+    return (strip_tags(message.content).strip() or 'Attachment')[:length]
+
+
+def record_message(sender_id, receiver_id, content, file=None):
+    """
+    Save a message and update the pair's Conversation in the same transaction:
+    last message, preview, timestamp and the receiver's unread counter.
+    """
+    user_a, user_b = Conversation.pair(sender_id, receiver_id)
+    unread_field = 'unread_a' if receiver_id == user_a else 'unread_b'
+
+    with transaction.atomic():
+        message = Message.objects.create(sender_id=sender_id, receiver_id=receiver_id, content=content, file=file)
+        _update_conversation(user_a, user_b, message, {unread_field: 1})
+    return message
+
+
+def record_messages(items):
+    """
+    record_message() for a batch of (sender_id, receiver_id, content): one
+    bulk insert, then one update per conversation in the batch. Returns the
+    saved messages, with ids, in the order given.
+    """
+    with transaction.atomic():
+        messages = Message.objects.bulk_create([
+            Message(sender_id=sender_id, receiver_id=receiver_id, content=content)
+            for sender_id, receiver_id, content in items
+        ])
+        latest = {}
+        unread = defaultdict(Counter)
+        for message in messages:
+            pair = Conversation.pair(message.sender_id, message.receiver_id)
+            latest[pair] = message
+            unread[pair]['unread_a' if message.receiver_id == pair[0] else 'unread_b'] += 1
+        for (user_a, user_b), message in latest.items():
+            _update_conversation(user_a, user_b, message, unread[user_a, user_b])
+    return messages
+
+
+def _update_conversation(user_a, user_b, message, unread):
+    """Point the pair's Conversation at `message`, adding `unread` ({field: count}) to its counters"""
+    changes = {
+        'last_message': message,
+        'last_message_preview': preview_text(message),
+        'last_message_at': message.timestamp,
+        **{field: F(field) + count for field, count in unread.items()},
+    }
+    conversation = Conversation.objects.filter(user_a_id=user_a, user_b_id=user_b)
+    if not conversation.update(**changes):
+        try:
+            # First message between these users
+            with transaction.atomic():
+                Conversation.objects.create(
+                    user_a_id=user_a,
+                    user_b_id=user_b,
+                    last_message=message,
+                    last_message_preview=changes['last_message_preview'],
+                    last_message_at=message.timestamp,
+                    **unread,
+                )
+        except IntegrityError:
+            # Another message created it first
+            conversation.update(**changes)
+
+
+def chat_users():
+    """Users messages can be sent to: active, with a profile"""
+    return get_user_model().objects.filter(is_active=True, userprofile__isnull=False)
+
+
+def chat_user_ids():
+    """
+    Ids of chat_users(), cached so the chat socket can check a receiver
+    without a query per message.
+    """
+    user_ids = cache.get(CHAT_USER_IDS_KEY)
+    if user_ids is None:
+        user_ids = frozenset(chat_users().values_list('id', flat=True))
+        cache.set(CHAT_USER_IDS_KEY, user_ids, CHAT_USER_IDS_TIMEOUT)
+    return user_ids
+
+
+def mark_read(user_id, other_id, up_to=None):
+    """
+    Mark the messages `other_id` sent to `user_id`, up to and including
+    message `up_to` (all of them if None), as read: one range UPDATE on the
+    (sender, receiver, id) index. The unread badge is reset to what arrived
+    after `up_to`. Returns the number of messages marked; nothing is written
+    when that is zero.
+    """
+    user_a, user_b = Conversation.pair(user_id, other_id)
+    unread_field = 'unread_a' if user_id == user_a else 'unread_b'
+    unread = Message.objects.filter(sender_id=other_id, receiver_id=user_id, is_read=False)
+
+    with transaction.atomic():
+        marked = (unread.filter(id__lte=up_to) if up_to is not None else unread).update(is_read=True)
+        if marked:
+            remaining = unread.filter(id__gt=up_to).count() if up_to is not None else 0
+            Conversation.objects.filter(user_a_id=user_a, user_b_id=user_b).update(**{unread_field: remaining})
+    return marked
+
+
+def total_unread(user_id):
+    """Unread messages across all of a user's conversations, summed from the counters"""
+    totals = Conversation.objects.filter(Q(user_a_id=user_id) | Q(user_b_id=user_id)).aggregate(
+        total=Sum(Case(When(user_a_id=user_id, then=F('unread_a')), default=F('unread_b')))
+    )
+    return totals['total'] or 0
+
+
+def inbox(user_id):
+    """A user's conversations, most recent first, with the other participant loaded"""
+    return (
+        Conversation.objects.filter(Q(user_a_id=user_id) | Q(user_b_id=user_id))
+        .select_related('user_a', 'user_b')
+        .order_by(F('last_message_at').desc(nulls_last=True))
+    )
+
+
+def conversation_to_dict(conversation, user_id):
+    """JSON-ready inbox entry from `user_id`'s point of view"""
+    other = conversation.user_b if conversation.user_a_id == user_id else conversation.user_a
+    return {
+        'user_id': other.id,
+        'username': other.username,
+        'last_message': conversation.last_message_preview,
+        'last_message_at': conversation.last_message_at.isoformat() if conversation.last_message_at else None,
+        'unread': conversation.unread_for(user_id),
+    }
+
+
+def chat_contacts(user_id):
+    """
+    Everyone `user_id` can chat with (chat_users(), the same set the socket
+    accepts as receivers), in one query: each user's presence row
+    (LEFT JOIN, absent until backfilled) and the unread count of their
+    conversation as `unread`.
+    """
+    conversation = Conversation.objects.filter(
+        Q(user_a_id=user_id, user_b_id=OuterRef('pk')) | Q(user_a_id=OuterRef('pk'), user_b_id=user_id)
+    )
+    unread = conversation.annotate(
+        mine=Case(When(user_a_id=user_id, then=F('unread_a')), default=F('unread_b'))
+    ).values('mine')[:1]
+    return (
+        chat_users().exclude(id=user_id)
+        .select_related('status')
+        .annotate(unread=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)))
+        .order_by('username')
+    )
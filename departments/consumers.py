@@ -1,8 +1,26 @@
+import asyncio
 import json
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import User
-from .models import Message, UserStatus
+from django.conf import settings
+from .chat import record_message, chat_user_ids, mark_read, total_unread
+from .message_buffer import MessageBuffer
+from .models import ChatGroup
+from . import groups, presence
+
+# Batches message inserts when CHAT_WRITE_BEHIND_MS is set; None saves each message directly
+message_buffer = MessageBuffer(settings.CHAT_WRITE_BEHIND_MS) if settings.CHAT_WRITE_BEHIND_MS > 0 else None
+
+# Pending offline announcements and buffered deliveries; asyncio only keeps
+# weak references to tasks
+_background_tasks = set()
+
+
+def _run_in_background(coroutine):
+    task = asyncio.ensure_future(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -12,58 +30,192 @@ class ChatConsumer(AsyncWebsocketConsumer):
             # 1. Individual Room (for private messages)
             self.room_group_name = f"user_{self.user.id}"
             # 2. Global Group (for online/offline notifications)
-            self.status_group_name = "staff_status_updates"
+            self.status_group_name = presence.STATUS_GROUP
 
-            # Join both groups
+            # 3. Group rooms (department, floor, role, all staff) the user is in
+            self.chat_group_ids = await database_sync_to_async(groups.group_ids_for)(self.user.id)
+
+            # Join all groups
             await self.channel_layer.group_add(self.room_group_name, self.channel_name)
             await self.channel_layer.group_add(self.status_group_name, self.channel_name)
+            for group_id in self.chat_group_ids:
+                await self.channel_layer.group_add(groups.channel_group(group_id), self.channel_name)
 
             await self.accept()
-            
-            # Update database to Online
-            await self.update_user_status(True)
 
-            # Broadcast to everyone else that this user is now Online
-            await self.channel_layer.group_send(
-                self.status_group_name,
-                {
-                    'type': 'user_online_notification',
-                    'username': self.user.username,
-                    'user_id': self.user.id
-                }
-            )
+            # Count this socket; broadcast only if the user was offline before
+            # (a second tab or the next page of the same session is not news)
+            if await sync_to_async(presence.connected)(self.user.id):
+                await self.channel_layer.group_send(
+                    self.status_group_name, presence.status_event(self.user, 'online')
+                )
+            self.heartbeat_task = asyncio.ensure_future(self.heartbeat())
         else:
             await self.close()
 
     async def disconnect(self, close_code):
         if self.user.is_authenticated:
-            # Update database to Offline
-            await self.update_user_status(False)
+            if getattr(self, 'heartbeat_task', None):
+                self.heartbeat_task.cancel()
+
+            # Last socket closed: announce offline after the grace period,
+            # unless the user has reconnected by then
+            if await sync_to_async(presence.disconnected)(self.user.id):
+                _run_in_background(self.announce_offline_later())
 
             # Leave groups
             await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
             await self.channel_layer.group_discard(self.status_group_name, self.channel_name)
+            for group_id in getattr(self, 'chat_group_ids', ()):
+                await self.channel_layer.group_discard(groups.channel_group(group_id), self.channel_name)
 
     # --- RECEIVE FROM BROWSER ---
     async def receive(self, text_data):
         data = json.loads(text_data)
+        if data.get('type') == 'mark_read':
+            await self.receive_mark_read(data)
+            return
+        if data.get('type') == 'group_message':
+            await self.receive_group_message(data)
+            return
+        if data.get('type') == 'group_mark_read':
+            await self.receive_group_mark_read(data)
+            return
+
         message = data.get('message')
-        receiver_id = data.get('receiver_id')
+        try:
+            receiver_id = int(data.get('receiver_id'))
+        except (TypeError, ValueError):
+            receiver_id = None
+        # Echoed back in the acknowledgement so the browser can match it up
+        client_id = data.get('client_id')
 
         if message and receiver_id:
-            # Save message to Database
-            await self.save_message(self.user.id, receiver_id, message)
+            # Checked against a cached id set instead of fetching the user
+            if receiver_id not in await database_sync_to_async(chat_user_ids)():
+                await self.send_error(client_id, 'Unknown recipient')
+                return
 
-            # Send message to the receiver's private room
-            await self.channel_layer.group_send(
-                f"user_{receiver_id}",
-                {
-                    'type': 'chat_message',
-                    'message': message,
-                    'sender_id': self.user.id,
-                    'sender_name': self.user.username
-                }
-            )
+            if message_buffer is None:
+                await self.deliver(receiver_id, message, client_id)
+            else:
+                # Keep reading frames while the message waits for its batch
+                _run_in_background(self.deliver(receiver_id, message, client_id))
+
+    async def deliver(self, receiver_id, message, client_id):
+        # Save message to Database, then acknowledge it to the sender and
+        # send it to the receiver's private room, both with its id
+        try:
+            if message_buffer is None:
+                saved = await self.save_message(self.user.id, receiver_id, message)
+            else:
+                saved = await message_buffer.save(self.user.id, receiver_id, message)
+        except Exception:
+            # Only this message failed; keep the socket open
+            await self.send_error(client_id, 'Message could not be saved')
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'message_ack',
+            'client_id': client_id,
+            'message_id': saved.id,
+            'message': message,
+            'sender_id': self.user.id,
+            'receiver_id': receiver_id
+        }))
+        await self.channel_layer.group_send(
+            f"user_{receiver_id}",
+            {
+                'type': 'chat_message',
+                'message_id': saved.id,
+                'message': message,
+                'sender_id': self.user.id,
+                'sender_name': self.user.username
+            }
+        )
+
+    async def receive_mark_read(self, data):
+        # {"type": "mark_read", "sender_id": <other user>, "up_to": <newest message id seen>}
+        try:
+            sender_id = int(data.get('sender_id'))
+            up_to = int(data.get('up_to'))
+        except (TypeError, ValueError):
+            return
+
+        marked, unread = await self.save_read_state(sender_id, up_to)
+        if not marked:
+            # Already read (another tab, a repeated frame): nothing to announce
+            return
+
+        # Tell the sender their messages were read, and the reader's other
+        # tabs their new unread total
+        await self.channel_layer.group_send(
+            f"user_{sender_id}",
+            {'type': 'read_receipt', 'reader_id': self.user.id, 'up_to': up_to}
+        )
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {'type': 'unread_sync', 'unread': unread}
+        )
+
+    async def receive_group_message(self, data):
+        # {"type": "group_message", "group_id": <room>, "message": <text>, "client_id": <any>}
+        message = data.get('message')
+        client_id = data.get('client_id')
+        try:
+            group_id = int(data.get('group_id'))
+        except (TypeError, ValueError):
+            group_id = None
+        if not message or group_id not in self.chat_group_ids:
+            await self.send_error(client_id, 'Not a member of this group')
+            return
+
+        try:
+            saved = await self.save_group_message(group_id, message)
+        except ChatGroup.DoesNotExist:
+            # Deleted since this socket connected (its rooms are loaded on connect)
+            self.chat_group_ids.discard(group_id)
+            await self.send_error(client_id, 'This group no longer exists')
+            return
+        if saved is None:
+            await self.send_error(client_id, 'Only announcers can post here')
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'message_ack',
+            'client_id': client_id,
+            'message_id': saved.id,
+            'group_id': group_id
+        }))
+        # One publish reaches every member's open sockets
+        await self.channel_layer.group_send(
+            groups.channel_group(group_id),
+            {
+                'type': 'group_chat_message',
+                'group_id': group_id,
+                'message_id': saved.id,
+                'message': message,
+                'sender_id': self.user.id,
+                'sender_name': self.user.username
+            }
+        )
+
+    async def receive_group_mark_read(self, data):
+        # {"type": "group_mark_read", "group_id": <room>, "up_to": <newest message id seen>}
+        try:
+            group_id = int(data.get('group_id'))
+            up_to = int(data.get('up_to'))
+        except (TypeError, ValueError):
+            return
+        if group_id in self.chat_group_ids:
+            await database_sync_to_async(groups.mark_group_read)(group_id, self.user.id, up_to)
+
+    async def send_error(self, client_id, error):
+        await self.send(text_data=json.dumps({
+            'type': 'message_error',
+            'client_id': client_id,
+            'error': error
+        }))
 
     # --- HANDLERS (Sending to Browser) ---
 
@@ -71,31 +223,81 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
             'type': 'private_message',
+            'message_id': event['message_id'],
+            'message': event['message'],
+            'sender_id': event['sender_id'],
+            'sender_name': event['sender_name']
+        }))
+
+    # Handle group room messages
+    async def group_chat_message(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'group_message',
+            'group_id': event['group_id'],
+            'message_id': event['message_id'],
             'message': event['message'],
             'sender_id': event['sender_id'],
             'sender_name': event['sender_name']
         }))
 
-    # Handle global online notifications
-    async def user_online_notification(self, event):
-        # Don't send the notification to the person who just logged in
+    # Handle read receipts for messages this user sent
+    async def read_receipt(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'read_receipt',
+            'reader_id': event['reader_id'],
+            'up_to': event['up_to']
+        }))
+
+    # Handle unread total changes made from another tab
+    async def unread_sync(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'unread_sync',
+            'unread': event['unread']
+        }))
+
+    # Handle global online/offline notifications
+    async def user_status_notification(self, event):
+        # Don't send the notification to the user it is about
         if event['user_id'] != self.user.id:
             await self.send(text_data=json.dumps({
                 'type': 'user_status_update',
+                'user_id': event['user_id'],
                 'username': event['username'],
-                'status': 'online'
+                'status': event['status']
             }))
 
+    # --- PRESENCE ---
+
+    async def heartbeat(self):
+        # Keeps this socket counted; if the worker dies the counter expires
+        while True:
+            await asyncio.sleep(presence.HEARTBEAT_INTERVAL)
+            await sync_to_async(presence.heartbeat)(self.user.id)
+
+    async def announce_offline_later(self):
+        await asyncio.sleep(presence.OFFLINE_GRACE)
+        if await sync_to_async(presence.went_offline)(self.user.id):
+            await self.channel_layer.group_send(
+                presence.STATUS_GROUP, presence.status_event(self.user, 'offline')
+            )
+
     # --- DATABASE OPERATIONS ---
 
     @database_sync_to_async
-    def update_user_status(self, online):
-        status, created = UserStatus.objects.get_or_create(user=self.user)
-        status.is_online = online
-        status.save()
+    def save_message(self, sender_id, receiver_id, content):
+        # Inserts by id (no user fetches) and updates the pair's Conversation
+        # (last message, unread count) in one transaction
+        return record_message(sender_id, receiver_id, content)
+
+    @database_sync_to_async
+    def save_read_state(self, sender_id, up_to):
+        marked = mark_read(self.user.id, sender_id, up_to)
+        return marked, total_unread(self.user.id) if marked else None
 
     @database_sync_to_async
-    def save_message(self, sender_id, receiver_id, content):
-        sender = User.objects.get(id=sender_id)
-        receiver = User.objects.get(id=receiver_id)
-        Message.objects.create(sender=sender, receiver=receiver, content=content)
\ No newline at end of file
+    def save_group_message(self, group_id, content):
+        # One row for the whole room; None if the user may not post in it
+        group = ChatGroup.objects.get(id=group_id)
+        if not groups.can_post(self.user, group):
+            return None
+        return groups.post_message(group, self.user.id, content)
@@ -0,0 +1,35 @@
+import functools
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect
+
+from .profiles import get_request_profile
+
+
+def role_required(*roles, redirect_to='unauthorized', message=None):
+    """
+    Let the view run only for signed-in users whose UserProfile has one of
+    `roles` (any role when none are given). The profile is available to the
+    view as request.profile.
+
+    Users without a profile go to the unauthorized page; users with another
+    role go to `redirect_to`, with `message` flashed when given.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        @login_required
+        def wrapper(request, *args, **kwargs):
+            profile = get_request_profile(request)
+            if profile is None:
+                return redirect('unauthorized')
+            if roles and profile.role not in roles:
+                if message:
+                    messages.error(request, message)
+                return redirect(redirect_to)
+            request.profile = profile
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
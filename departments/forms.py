@@ -1,19 +1,63 @@
 from django import forms
+from django.contrib.admin.forms import AdminAuthenticationForm
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password, check_password
+from backend.core.cache_keys import versioned_key
 from backend.core.models import Department
 from .models import Stream, Floor, UserProfile
 
+# Seconds the staff login dropdown options are reused; department, stream and
+# floor changes bump the data version and invalidate them sooner
+LOGIN_CHOICES_TIMEOUT = 300
+
+
+def login_choices():
+    """
+    Departments, streams (with their department) and floors for the staff
+    login dropdowns, cached so rendering the login page costs no queries.
+    """
+    key = versioned_key('login-choices')
+    choices = cache.get(key)
+    if choices is None:
+        choices = {
+            'department': list(Department.objects.order_by('pk')),
+            'stream': list(Stream.objects.select_related('department').order_by('pk')),
+            # Only what the dropdown shows (no password hashes in the cache)
+            'floor': list(Floor.objects.only('id', 'name').order_by('pk')),
+        }
+        cache.set(key, choices, LOGIN_CHOICES_TIMEOUT)
+    return choices
+
+
+class RateLimitedLoginMixin:
+    """Tell a locked-out user to wait instead of reporting a wrong password"""
+
+    def get_invalid_login_error(self):
+        seconds = getattr(self.request, 'login_retry_after', None)
+        if seconds:
+            minutes = max(round(seconds / 60), 1)
+            return ValidationError(
+                f'Too many failed login attempts. Please try again in {minutes} minute(s).',
+                code='rate_limited',
+            )
+        return super().get_invalid_login_error()
+
 # Simple form for Principal login
-class PrincipalLoginForm(AuthenticationForm):
+class PrincipalLoginForm(RateLimitedLoginMixin, AuthenticationForm):
     pass
 
 # Simple form for Teacher login
-class TeacherLoginForm(AuthenticationForm):
+class TeacherLoginForm(RateLimitedLoginMixin, AuthenticationForm):
+    pass
+
+# Django admin login (set on admin.site in admin.py)
+class AdminSiteLoginForm(RateLimitedLoginMixin, AdminAuthenticationForm):
     pass
 
-class AdminLoginForm(AuthenticationForm):
+class AdminLoginForm(RateLimitedLoginMixin, AuthenticationForm):
     ROLE_CHOICES = [
         ('', 'Select Role'),
         ('Vice Principal', 'Vice Principal'),
@@ -34,10 +78,12 @@ class AdminLoginForm(AuthenticationForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Ensure querysets are fresh and point to all objects
-        self.fields['department'].queryset = Department.objects.all()
-        self.fields['stream'].queryset = Stream.objects.all()
-        self.fields['floor'].queryset = Floor.objects.all()
+        # The template renders the dropdowns from the cached options; the field
+        # querysets (fresh for every form) only validate the submitted choice
+        options = login_choices()
+        self.department_options = options['department']
+        self.stream_options = options['stream']
+        self.floor_options = options['floor']
         
     def clean(self):
         cleaned_data = super().clean()
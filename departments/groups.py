@@ -0,0 +1,139 @@
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import ChatGroup, ChatGroupMember, GroupMessage, UserProfile
+
+# Messages returned per group history request
+GROUP_HISTORY_PAGE_SIZE = 50
+
+# Roles allowed to post in the all-staff announcements room
+ANNOUNCER_ROLES = ('Principal', 'Vice Principal')
+
+
+def channel_group(group_id):
+    """Channel layer group every connected member's socket joins"""
+    return f'chatgroup_{group_id}'
+
+
+def _wanted_groups(profile):
+    """(kind, key, name) of every room this profile belongs in"""
+    wanted = [('staff', 'all', 'All staff'), ('role', profile.role, profile.get_role_display())]
+    if profile.department_id:
+        wanted.append(('department', str(profile.department_id), str(profile.department)))
+    if profile.floor_id:
+        wanted.append(('floor', str(profile.floor_id), str(profile.floor)))
+    return wanted
+
+
+def _get_groups(wanted):
+    """The ChatGroup rows for (kind, key, name) triples, creating missing ones"""
+    groups = []
+    for kind, key, name in wanted:
+        group, _ = ChatGroup.objects.get_or_create(kind=kind, key=key, defaults={'name': name})
+        groups.append(group)
+    return groups
+
+
+def sync_memberships(profile):
+    """
+    Put the profile's user in the rooms for their department, floor and role
+    (and all staff), and take them out of rooms they no longer belong to.
+    """
+    groups = _get_groups(_wanted_groups(profile))
+    with transaction.atomic():
+        ChatGroupMember.objects.filter(user_id=profile.user_id).exclude(group__in=groups).delete()
+        ChatGroupMember.objects.bulk_create(
+            [ChatGroupMember(group=group, user_id=profile.user_id) for group in groups],
+            ignore_conflicts=True,
+        )
+
+
+def sync_all_memberships():
+    """Rebuild every membership from UserProfile with one bulk insert; returns rows created"""
+    profiles = list(UserProfile.objects.select_related('department', 'floor'))
+    wanted = {}
+    for profile in profiles:
+        for kind, key, name in _wanted_groups(profile):
+            wanted.setdefault((kind, key), name)
+    groups = {
+        (group.kind, group.key): group
+        for group in _get_groups([(kind, key, name) for (kind, key), name in wanted.items()])
+    }
+
+    members = [
+        ChatGroupMember(group=groups[kind, key], user_id=profile.user_id)
+        for profile in profiles
+        for kind, key, _ in _wanted_groups(profile)
+    ]
+    with transaction.atomic():
+        wanted_pairs = {(member.group_id, member.user_id) for member in members}
+        stale = [
+            member.pk
+            for member in ChatGroupMember.objects.only('group_id', 'user_id')
+            if (member.group_id, member.user_id) not in wanted_pairs
+        ]
+        ChatGroupMember.objects.filter(pk__in=stale).delete()
+        existing = set(ChatGroupMember.objects.values_list('group_id', 'user_id'))
+        new = [member for member in members if (member.group_id, member.user_id) not in existing]
+        ChatGroupMember.objects.bulk_create(new, batch_size=500, ignore_conflicts=True)
+    return len(new)
+
+
+def group_ids_for(user_id):
+    """Ids of the rooms a user belongs to (the sockets join their channel groups)"""
+    return set(ChatGroupMember.objects.filter(user_id=user_id).values_list('group_id', flat=True))
+
+
+def can_post(user, group):
+    """Members post in their rooms; the all-staff room is for announcements only"""
+    if group.kind != 'staff' or user.is_superuser:
+        return True
+    return UserProfile.objects.filter(user=user, role__in=ANNOUNCER_ROLES).exists()
+
+
+def post_message(group, sender_id, content):
+    """
+    Store one message for the whole room and move the sender's read cursor
+    past it. Delivery to members is a single channel layer group_send.
+    """
+    with transaction.atomic():
+        message = GroupMessage.objects.create(group=group, sender_id=sender_id, content=content)
+        ChatGroupMember.objects.filter(group=group, user_id=sender_id).update(last_read_id=message.id)
+    return message
+
+
+def mark_group_read(group_id, user_id, up_to):
+    """Move a member's read cursor forward to message `up_to`; one UPDATE, never backwards"""
+    return ChatGroupMember.objects.filter(
+        group_id=group_id, user_id=user_id, last_read_id__lt=up_to
+    ).update(last_read_id=up_to)
+
+
+def user_groups(user_id):
+    """A user's rooms with their unread counts (messages past the read cursor)"""
+    return (
+        ChatGroupMember.objects.filter(user_id=user_id)
+        .select_related('group')
+        .annotate(unread=Count('group__messages', filter=Q(group__messages__id__gt=F('last_read_id'))))
+        .order_by('group__kind', 'group__name')
+    )
+
+
+def group_history(group_id, before=None, limit=GROUP_HISTORY_PAGE_SIZE):
+    """The newest `limit` messages of a room older than `before`, oldest first, plus whether more remain"""
+    messages = GroupMessage.objects.filter(group_id=group_id).select_related('sender')
+    if before:
+        messages = messages.filter(id__lt=before)
+    newest_first = list(messages.order_by('-id')[:limit + 1])
+    return newest_first[:limit][::-1], len(newest_first) > limit
+
+
+def group_message_to_dict(message):
+    return {
+        'id': message.id,
+        'group_id': message.group_id,
+        'sender_id': message.sender_id,
+        'sender_name': message.sender.username,
+        'content': message.content,
+        'timestamp': message.timestamp.isoformat(),
+    }
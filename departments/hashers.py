@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class RoleSecretHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with ROLE_SECRET_ITERATIONS rounds, for the stream,
+    department and floor secrets on UserProfile. Those are only checked
+    after the account password has passed, so they use a lighter tier than
+    account passwords (which keep Django's default).
+    """
+    algorithm = 'pbkdf2_sha256_role'
+
+    @property
+    def iterations(self):
+        return settings.ROLE_SECRET_ITERATIONS
@@ -0,0 +1,119 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LIMIT_SCOPES = ('username', 'ip')
+
+
+def _incr(key, amount=1, timeout=None):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.add(key, amount, timeout)
+        return amount
+
+
+def client_ip(request):
+    """
+    The client address, or '' when it cannot be told apart from a proxy's.
+    Behind LOGIN_PROXY_HOPS reverse proxies (1 on Render) it is the entry
+    the outermost proxy appended to X-Forwarded-For; anything further left
+    is whatever the client sent. A forwarded request with fewer entries
+    than that, or any forwarded request while LOGIN_PROXY_HOPS is 0, came
+    through an unconfigured proxy: REMOTE_ADDR is then the proxy, shared
+    by every client, and must not be rate limited.
+    """
+    hops = settings.LOGIN_PROXY_HOPS
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if hops and len(forwarded) >= hops:
+        return forwarded[-hops]
+    if forwarded:
+        return ''
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _limits():
+    return {
+        'username': settings.LOGIN_ATTEMPTS_PER_USERNAME,
+        'ip': settings.LOGIN_ATTEMPTS_PER_IP,
+    }
+
+
+def _identities(request, username):
+    return {
+        'username': (username or '').strip().lower(),
+        'ip': client_ip(request),
+    }
+
+
+def _key(scope, identity, bucket):
+    # Hashed so any username is a safe cache key
+    digest = hashlib.sha256(identity.encode()).hexdigest()[:32]
+    return f'login-limit:{scope}:{digest}:{bucket}'
+
+
+def _window(now=None):
+    # Sliding window approximated with two fixed buckets of LOGIN_ATTEMPT_WINDOW
+    # seconds: the previous bucket counts for the part of it still inside the window
+    window = settings.LOGIN_ATTEMPT_WINDOW
+    now = time.time() if now is None else now
+    bucket, elapsed = divmod(now, window)
+    return window, int(bucket), elapsed
+
+
+def failed_attempts(scope, identity):
+    """Failed logins for a username or IP within the last LOGIN_ATTEMPT_WINDOW seconds"""
+    window, bucket, elapsed = _window()
+    counts = cache.get_many([_key(scope, identity, bucket - 1), _key(scope, identity, bucket)])
+    previous = counts.get(_key(scope, identity, bucket - 1), 0)
+    current = counts.get(_key(scope, identity, bucket), 0)
+    return previous * (window - elapsed) / window + current
+
+
+def retry_after(request, username):
+    """
+    Seconds until another attempt for this username/IP is allowed, or 0.
+    Only reads the cache, so blocked attempts cost no password hash.
+    """
+    window, _, elapsed = _window()
+    identities = _identities(request, username)
+    for scope, limit in _limits().items():
+        identity = identities[scope]
+        if identity and limit and failed_attempts(scope, identity) >= limit:
+            _incr(f'login-limit-metrics:blocked:{scope}')
+            return max(int(window - elapsed), 1)
+    return 0
+
+
+def record_failure(request, username):
+    """Count a failed login against its username and IP"""
+    window, bucket, _ = _window()
+    for scope, identity in _identities(request, username).items():
+        if identity:
+            # Kept for two windows: the next bucket still weighs this one
+            _incr(_key(scope, identity, bucket), timeout=2 * window)
+    _incr('login-limit-metrics:failures')
+
+
+def clear_username(username):
+    """Forget a username's failures once it has signed in (its IP keeps its count)"""
+    _, bucket, _ = _window()
+    identity = (username or '').strip().lower()
+    if identity:
+        cache.delete_many([_key('username', identity, bucket - 1), _key('username', identity, bucket)])
+
+
+def limit_metrics():
+    """Failed logins and rejected attempts per scope, across all workers"""
+    keys = ['login-limit-metrics:failures'] + [f'login-limit-metrics:blocked:{scope}' for scope in LIMIT_SCOPES]
+    values = cache.get_many(keys)
+    return {
+        'failures': values.get('login-limit-metrics:failures', 0),
+        'blocked': {scope: values.get(f'login-limit-metrics:blocked:{scope}', 0) for scope in LIMIT_SCOPES},
+        'window_seconds': settings.LOGIN_ATTEMPT_WINDOW,
+        'limits': _limits(),
+    }
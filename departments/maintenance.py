@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+MAINTENANCE_KEY = 'maintenance:state'
+# Seconds each worker trusts the switch it last read from the cache
+CHECK_INTERVAL = 2
+# Default Retry-After sent with the 503 page
+RETRY_AFTER = 300
+
+# Paths served even during maintenance: health checks and the admin
+EXEMPT_PATHS = ('/healthz/', '/admin/')
+
+_checked = {'at': 0.0, 'state': None}
+_page = {}
+
+
+def set_maintenance(enabled, retry_after=RETRY_AFTER):
+    """
+    Switch maintenance mode on or off for every worker sharing the cache
+    (within CHECK_INTERVAL seconds). Overrides the MAINTENANCE_MODE setting.
+    """
+    state = {'enabled': enabled, 'retry_after': retry_after}
+    cache.set(MAINTENANCE_KEY, state, None)
+    _checked['at'] = 0.0
+    return state
+
+
+def clear_maintenance():
+    """Forget the runtime switch and fall back to the MAINTENANCE_MODE setting"""
+    cache.delete(MAINTENANCE_KEY)
+    _checked['at'] = 0.0
+
+
+def maintenance_state():
+    """
+    {'enabled': bool, 'retry_after': seconds}, read from the cache at most
+    once every CHECK_INTERVAL seconds per worker.
+    """
+    now = time.monotonic()
+    if _checked['state'] is None or now - _checked['at'] >= CHECK_INTERVAL:
+        state = cache.get(MAINTENANCE_KEY)
+        if state is None:
+            state = {'enabled': settings.MAINTENANCE_MODE, 'retry_after': RETRY_AFTER}
+        _checked['state'], _checked['at'] = state, now
+    return _checked['state']
+
+
+def maintenance_page():
+    """The 503 page body, rendered once per worker"""
+    if 'body' not in _page:
+        _page['body'] = render_to_string('maintenance.html').encode()
+    return _page['body']
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from departments.models import UserStatus
+
+
+class Command(BaseCommand):
+    help = 'Create the missing chat presence (UserStatus) rows for existing users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per query')
+
+    def handle(self, *args, **options):
+        user_ids = list(
+            get_user_model().objects.filter(status__isnull=True).values_list('id', flat=True)
+        )
+        # ignore_conflicts: a user created meanwhile already has its row from the signal
+        UserStatus.objects.bulk_create(
+            [UserStatus(user_id=user_id) for user_id in user_ids],
+            batch_size=options['batch_size'],
+            ignore_conflicts=True,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Created {len(user_ids)} user status rows'))
@@ -0,0 +1,56 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from departments.benchmark import QueryCounter, create_users, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test ChatConsumer with simulated staff sockets on a throwaway test database '
+        'and the in-memory channel layer, and print a JSON report'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Simulated users, each with one socket')
+        parser.add_argument('--rounds', type=int, default=10, help='Rounds of messages; every user is in one pair per round')
+        parser.add_argument('--write-behind-ms', type=int, default=0, help='Batch message inserts like CHAT_WRITE_BEHIND_MS')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+        parser.add_argument('--max-p99-ms', type=float, help='Fail if the message round-trip p99 is slower than this')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('--users must be at least 2')
+
+        # Never touch real users, messages or the shared cache
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'chat-benchmark'}},
+            ):
+                users = create_users(options['users'])
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    report = async_to_sync(run_benchmark)(
+                        users, options['rounds'], counter, options['write_behind_ms']
+                    )
+                report['database'] = connection.vendor
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        limit = options['max_p99_ms']
+        if limit is not None and report['round_trip_ms']['p99'] > limit:
+            raise CommandError(f"Round-trip p99 {report['round_trip_ms']['p99']} ms is over {limit} ms")
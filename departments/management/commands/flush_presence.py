@@ -0,0 +1,32 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from departments import presence
+
+
+class Command(BaseCommand):
+    help = 'Write live chat presence to UserStatus and announce users whose connections expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and flush every N seconds (default: flush once and exit)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            changed, expired = presence.flush()
+            if expired:
+                channel_layer = get_channel_layer()
+                for user in expired:
+                    async_to_sync(channel_layer.group_send)(
+                        presence.STATUS_GROUP, presence.status_event(user, 'offline')
+                    )
+            self.stdout.write(f'Updated {changed} user status rows, {len(expired)} expired')
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from departments import maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        'Switch maintenance mode on or off for every worker sharing the cache, '
+        'or show its state ("clear" falls back to the MAINTENANCE_MODE setting)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['on', 'off', 'clear', 'status'])
+        parser.add_argument(
+            '--retry-after', type=int, default=maintenance.RETRY_AFTER,
+            help='Seconds clients are told to wait (Retry-After header)',
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action != 'status' and 'locmem' in settings.CACHES['default']['BACKEND'].lower():
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to this process (REDIS_URL is not set): running servers will not see the change'
+            ))
+        if action in ('on', 'off'):
+            maintenance.set_maintenance(action == 'on', options['retry_after'])
+        elif action == 'clear':
+            maintenance.clear_maintenance()
+
+        state = maintenance.maintenance_state()
+        self.stdout.write(
+            f"Maintenance mode is {'ON' if state['enabled'] else 'OFF'}"
+            + (f" (Retry-After: {state['retry_after']}s)" if state['enabled'] else '')
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from departments.groups import sync_all_memberships
+
+
+class Command(BaseCommand):
+    help = 'Create the department, floor, role and all-staff chat rooms and their memberships from user profiles'
+
+    def handle(self, *args, **options):
+        created = sync_all_memberships()
+        self.stdout.write(self.style.SUCCESS(f'Added {created} chat group memberships'))
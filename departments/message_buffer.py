@@ -0,0 +1,55 @@
+import asyncio
+
+from channels.db import database_sync_to_async
+
+from .chat import record_messages
+
+
+class MessageBuffer:
+    """
+    Write-behind buffer for chat messages, one per worker process.
+
+    save() queues a message and waits; the queue is written with one
+    record_messages() call (a single bulk insert) `delay_ms` after its first
+    message arrives, or as soon as it holds `max_batch` messages. Under load
+    many sockets share each insert instead of each taking its own round trip
+    through the database thread.
+    """
+
+    def __init__(self, delay_ms, max_batch=500):
+        self.delay = delay_ms / 1000
+        self.max_batch = max_batch
+        self.pending = []
+        self.flush_task = None
+
+    async def save(self, sender_id, receiver_id, content):
+        """Queue a message; returns the saved Message once its batch is written"""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(((sender_id, receiver_id, content), future))
+        if len(self.pending) >= self.max_batch:
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+        return await future
+
+    async def flush_later(self):
+        await asyncio.sleep(self.delay)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            messages = await database_sync_to_async(record_messages)([item for item, _ in batch])
+        except Exception as exc:
+            # The whole batch was rolled back; every sender gets the error
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), message in zip(batch, messages):
+            # A sender that disconnected meanwhile has cancelled its future
+            if not future.done():
+                future.set_result(message)
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from backend.core.cache_keys import versioned_key
+from backend.core.models import Department, Student, Teacher
+from .models import Message
+
+# Seconds a computed set of metrics is reused; model changes invalidate sooner
+METRICS_TIMEOUT = 300
+
+DEPARTMENT_NAMES = dict(Department.DEPARTMENT_CHOICES)
+
+
+def _cached(key, compute):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, METRICS_TIMEOUT)
+    return value
+
+
+def school_metrics():
+    """
+    School-wide counts for the dashboards, computed with three aggregate
+    queries and cached until students, teachers, classes or departments change.
+    """
+    return _cached(versioned_key('metrics', 'school'), _compute_school_metrics)
+
+
+def _compute_school_metrics():
+    week_ago = timezone.localdate() - timedelta(days=7)
+
+    students = Student.objects.aggregate(
+        total=Count('id'),
+        new_this_week=Count('id', filter=Q(date_of_admission__gte=week_ago)),
+    )
+    teachers = Teacher.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='ACTIVE')),
+        new_this_week=Count('id', filter=Q(employment_date__gte=week_ago)),
+    )
+    departments = [
+        {
+            'id': department['id'],
+            'name': DEPARTMENT_NAMES.get(department['name'], department['name']),
+            'classes': department['num_classes'],
+            'teachers': department['num_teachers'],
+            'students': department['num_students'],
+            'subjects': department['num_subjects'],
+        }
+        for department in Department.objects.with_stats().order_by('name').values(
+            'id', 'name', 'num_classes', 'num_teachers', 'num_students', 'num_subjects'
+        )
+    ]
+
+    return {
+        'total_students': students['total'],
+        'new_students_this_week': students['new_this_week'],
+        'total_teachers': teachers['total'],
+        'active_teachers': teachers['active'],
+        'new_teachers_this_week': teachers['new_this_week'],
+        # Every class and subject belongs to exactly one department
+        'total_classes': sum(department['classes'] for department in departments),
+        'total_subjects': sum(department['subjects'] for department in departments),
+        'total_departments': len(departments),
+        'departments': departments,
+    }
+
+
+def department_metrics(department_id):
+    """Counts for one department, taken from the cached school metrics (no extra query)"""
+    for department in school_metrics()['departments']:
+        if department['id'] == department_id:
+            return department
+    return {'id': department_id, 'name': '', 'classes': 0, 'teachers': 0, 'students': 0, 'subjects': 0}
+
+
+def teacher_classes(user):
+    """Classes assigned to the teacher linked to this user, with student counts"""
+    return _cached(versioned_key('metrics', 'teacher', user.pk), lambda: _compute_teacher_classes(user))
+
+
+def _compute_teacher_classes(user):
+    teacher = Teacher.objects.filter(user=user).prefetch_related('subjects').first()
+    if teacher is None:
+        return []
+
+    subjects = ', '.join(subject.name for subject in teacher.subjects.all())
+    classes = (
+        teacher.assigned_classes
+        .select_related('department')
+        .annotate(num_students=Count('students'))
+        .order_by('name')
+    )
+    return [
+        {
+            'id': class_obj.id,
+            'name': str(class_obj),
+            'subject': subjects,
+            'student_count': class_obj.num_students,
+            'schedule': '',
+            'average_grade': None,
+            'room': '',
+        }
+        for class_obj in classes
+    ]
+
+
+def unread_message_count(user):
+    """Unread chat messages for this user; not cached, it changes with every message"""
+    return Message.objects.filter(receiver=user, is_read=False).count()
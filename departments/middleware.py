@@ -1,19 +1,46 @@
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from . import maintenance
+from .profiles import get_request_profile
 
 class MaintenanceModeMiddleware:
+    """
+    Answer every request with the cached 503 page while maintenance mode is
+    on (see departments/maintenance.py and `manage.py maintenance`). Costs
+    one cache read per worker every few seconds, not one per request.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Skip maintenance for admin paths
-        if request.path.startswith('/admin/'):
+        # Health checks and the admin stay reachable
+        if request.path.startswith(maintenance.EXEMPT_PATHS):
             return self.get_response(request)
         
-        # Check if maintenance mode is ON
-        if getattr(settings, 'MAINTENANCE_MODE', False):
-            html = render_to_string('maintenance.html')
-            return HttpResponse(html, status=503)
+        state = maintenance.maintenance_state()
+        if state['enabled']:
+            response = HttpResponse(maintenance.maintenance_page(), status=503)
+            response['Retry-After'] = str(state['retry_after'])
+            response['Cache-Control'] = 'no-store'
+            # Don't log an error line for each of them (Django's own flag for responses it logged already)
+            response._has_been_logged = True
+            return response
         
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+
+class UserProfileMiddleware:
+    """
+    Make the signed-in user's UserProfile (with department, stream and
+    floor) available as request.profile. It is loaded on first use, once
+    per request, and comes from the shared cache when possible.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_request_profile(request))
+        return self.get_response(request)
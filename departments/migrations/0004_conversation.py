@@ -0,0 +1,69 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+from django.utils.html import strip_tags
+
+
+def build_conversations(apps, schema_editor):
+    """Create a Conversation for every pair of users that already exchanged messages"""
+    Message = apps.get_model('departments', 'Message')
+    Conversation = apps.get_model('departments', 'Conversation')
+
+    pairs = {}
+    directions = Message.objects.values('sender_id', 'receiver_id').annotate(
+        last_id=Max('id'),
+        unread=Count('id', filter=Q(is_read=False)),
+    ).order_by()
+    for row in directions:
+        user_a, user_b = sorted((row['sender_id'], row['receiver_id']))
+        pair = pairs.setdefault((user_a, user_b), {'last_id': 0, 'unread_a': 0, 'unread_b': 0})
+        pair['last_id'] = max(pair['last_id'], row['last_id'])
+        # Unread messages are waiting for their receiver
+        pair['unread_a' if row['receiver_id'] == user_a else 'unread_b'] += row['unread']
+
+    last_messages = Message.objects.in_bulk([pair['last_id'] for pair in pairs.values()])
+    conversations = []
+    for (user_a, user_b), pair in pairs.items():
+        message = last_messages[pair['last_id']]
+        conversations.append(Conversation(
+            user_a_id=user_a,
+            user_b_id=user_b,
+            last_message=message,
+            last_message_preview=(strip_tags(message.content).strip() or 'Attachment')[:255],
+            last_message_at=message.timestamp,
+            unread_a=pair['unread_a'],
+            unread_b=pair['unread_b'],
+        ))
+    Conversation.objects.bulk_create(conversations, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departments', '0003_message_conversation_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_preview', models.CharField(blank=True, max_length=255)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_a', models.PositiveIntegerField(default=0)),
+                ('unread_b', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='departments.message')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_a', '-last_message_at'], name='conversation_user_a_idx'), models.Index(fields=['user_b', '-last_message_at'], name='conversation_user_b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_a', 'user_b'), name='unique_conversation_pair')],
+            },
+        ),
+        migrations.RunPython(build_conversations, migrations.RunPython.noop),
+    ]
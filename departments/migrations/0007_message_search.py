@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# The search index lives outside the ORM, so it is created with SQL for the
+# database in use. On SQLite an FTS5 table mirrors Message.content through
+# triggers (bulk inserts from the write-behind buffer send no signals); on
+# PostgreSQL a GIN expression index matches the SearchVector in search.py.
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE departments_message_fts USING fts5(
+        content, content='departments_message', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER departments_message_fts_insert AFTER INSERT ON departments_message BEGIN
+        INSERT INTO departments_message_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER departments_message_fts_delete AFTER DELETE ON departments_message BEGIN
+        INSERT INTO departments_message_fts(departments_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER departments_message_fts_update AFTER UPDATE OF content ON departments_message BEGIN
+        INSERT INTO departments_message_fts(departments_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO departments_message_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    # Index the messages that already exist
+    "INSERT INTO departments_message_fts(departments_message_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS departments_message_fts_insert',
+    'DROP TRIGGER IF EXISTS departments_message_fts_delete',
+    'DROP TRIGGER IF EXISTS departments_message_fts_update',
+    'DROP TABLE IF EXISTS departments_message_fts',
+]
+
+POSTGRES_CREATE = [
+    """
+    CREATE INDEX message_content_search_idx ON departments_message
+    USING GIN (to_tsvector('english'::regconfig, COALESCE(content, '')))
+    """,
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS message_content_search_idx',
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departments', '0006_chat_groups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,3 +1,6 @@
+import os
+import uuid
+
 from django.db import models
 from django.conf import settings
 from backend.core.models import Department
@@ -70,10 +73,143 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Conversation history: one index seek per direction, newest first
+            models.Index(fields=['sender', 'receiver', 'id'], name='message_conversation_idx'),
+        ]
 
     def __str__(self):
         return f'{self.sender} to {self.receiver}'
 
+class Conversation(models.Model):
+    """
+    One row per pair of users who have exchanged messages, kept up to date
+    by chat.record_message() so the inbox and unread badges never scan Message.
+    The pair is stored with user_a.id < user_b.id.
+    """
+    user_a = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    user_b = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=255, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    # Unread messages waiting for each participant
+    unread_a = models.PositiveIntegerField(default=0)
+    unread_b = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_a', 'user_b'], name='unique_conversation_pair'),
+        ]
+        indexes = [
+            # Inbox: a user's conversations, most recent first
+            models.Index(fields=['user_a', '-last_message_at'], name='conversation_user_a_idx'),
+            models.Index(fields=['user_b', '-last_message_at'], name='conversation_user_b_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_a} & {self.user_b}'
+
+    @staticmethod
+    def pair(user_id, other_id):
+        """(user_a_id, user_b_id) for two users, in stored order"""
+        return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+    def other_user_id(self, user_id):
+        return self.user_b_id if user_id == self.user_a_id else self.user_a_id
+
+    def unread_for(self, user_id):
+        return self.unread_a if user_id == self.user_a_id else self.unread_b
+
+class ChatUpload(models.Model):
+    """
+    A chat attachment uploaded in chunks (see uploads.py). Chunks are
+    appended to a partial file until `received` reaches `size`; the finished
+    file is stored once per content hash and images get a thumbnail in the
+    background.
+    """
+    STATUS_CHOICES = [
+        ('UPLOADING', 'Uploading'),
+        ('COMPLETE', 'Complete'),
+    ]
+
+    # Public id the browser resumes with
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_uploads')
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='UPLOADING')
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    file = models.FileField(upload_to='chat_uploads/', blank=True)
+    thumbnail = models.ImageField(upload_to='chat_uploads/thumbs/', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def is_image(self):
+        return os.path.splitext(self.name)[1].lower() in ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+class ChatGroup(models.Model):
+    """
+    A group chat room. Rooms are derived from UserProfile: one per
+    department, floor and role, plus an all-staff room for announcements.
+    Membership is kept in sync by groups.sync_memberships().
+    """
+    KIND_CHOICES = [
+        ('staff', 'All staff'),
+        ('department', 'Department'),
+        ('floor', 'Floor'),
+        ('role', 'Role'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Department/floor id or role name; 'all' for the staff room
+    key = models.CharField(max_length=50)
+    name = models.CharField(max_length=100)
+    members = models.ManyToManyField(settings.AUTH_USER_MODEL, through='ChatGroupMember', related_name='chat_groups')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_chat_group'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class ChatGroupMember(models.Model):
+    group = models.ForeignKey(ChatGroup, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_group_memberships')
+    # Read cursor: id of the newest group message this member has read
+    last_read_id = models.PositiveBigIntegerField(default=0)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'user'], name='unique_chat_group_member'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} in {self.group}'
+
+class GroupMessage(models.Model):
+    """A message posted to a ChatGroup: one row however many members read it"""
+    group = models.ForeignKey(ChatGroup, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='group_messages')
+    content = models.TextField()
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # History pages and unread counts: messages of a group after/before an id
+            models.Index(fields=['group', 'id'], name='group_message_group_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.sender} in {self.group}'
+
 class UserStatus(models.Model):
     # Changed User to settings.AUTH_USER_MODEL
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='status')
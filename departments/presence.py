@@ -0,0 +1,143 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserStatus
+
+# Presence lives in the shared cache (Redis when REDIS_URL is set), so every
+# Daphne worker sees the same state. UserStatus is only a periodic snapshot of
+# it, written by the flush_presence command.
+
+# Group every chat socket joins for online/offline notifications
+STATUS_GROUP = 'staff_status_updates'
+# Seconds a connection counter and online flag survive without a heartbeat; a
+# worker that dies without running disconnect() lets its users' entries expire
+PRESENCE_TIMEOUT = 90
+# Seconds between heartbeats from each open socket
+HEARTBEAT_INTERVAL = 30
+# Seconds a user may have no open socket before being announced offline, so
+# moving from one page to the next (close, then reopen) is not a transition
+OFFLINE_GRACE = 5
+
+
+def _key(kind, user_id):
+    return f'presence:{kind}:{user_id}'
+
+
+def _add_connection(user_id):
+    key = _key('connections', user_id)
+    cache.add(key, 0, PRESENCE_TIMEOUT)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 0, PRESENCE_TIMEOUT)
+        return cache.incr(key)
+
+
+def _connection_count(user_id):
+    return cache.get(_key('connections', user_id)) or 0
+
+
+def connected(user_id):
+    """
+    Count a newly opened socket. True when the user has just come online
+    (no other tab open and not inside the offline grace period).
+    """
+    _add_connection(user_id)
+    cache.set(_key('seen', user_id), timezone.now(), None)
+    return cache.add(_key('online', user_id), True, PRESENCE_TIMEOUT)
+
+
+def heartbeat(user_id):
+    """Keep an open socket's counter and its user's online flag alive"""
+    if not cache.touch(_key('connections', user_id), PRESENCE_TIMEOUT):
+        # Counter expired while the socket stayed open (stalled worker)
+        _add_connection(user_id)
+    if not cache.touch(_key('online', user_id), PRESENCE_TIMEOUT):
+        cache.add(_key('online', user_id), True, PRESENCE_TIMEOUT)
+    cache.set(_key('seen', user_id), timezone.now(), None)
+
+
+def disconnected(user_id):
+    """Count a closed socket. True when it was the user's last one."""
+    key = _key('connections', user_id)
+    try:
+        count = cache.decr(key)
+    except ValueError:
+        count = 0
+    if count < 0:
+        cache.set(key, 0, PRESENCE_TIMEOUT)
+    cache.set(_key('seen', user_id), timezone.now(), None)
+    return count <= 0
+
+
+def went_offline(user_id):
+    """
+    Called OFFLINE_GRACE seconds after a user's last socket closed. True
+    exactly once per offline transition, whichever worker asks first.
+    """
+    if _connection_count(user_id) > 0:
+        return False
+    return bool(cache.delete(_key('online', user_id)))
+
+
+def status_event(user, status):
+    """Channel layer event announcing a transition to STATUS_GROUP"""
+    return {
+        'type': 'user_status_notification',
+        'user_id': user.id,
+        'username': user.username,
+        'status': status,
+    }
+
+
+def with_presence(users):
+    """
+    The users as a list with live `is_online` and `last_seen` attributes,
+    read from the cache in one round trip. Falls back to the flushed
+    UserStatus row (if loaded) for users the cache knows nothing about.
+    """
+    users = list(users)
+    keys = {}
+    for user in users:
+        keys[user.id] = (_key('online', user.id), _key('seen', user.id))
+    found = cache.get_many([key for pair in keys.values() for key in pair])
+
+    for user in users:
+        online_key, seen_key = keys[user.id]
+        # Only use the UserStatus row if it came with the query (select_related)
+        status = user._state.fields_cache.get('status')
+        user.is_online = online_key in found
+        user.last_seen = found.get(seen_key) or (status.last_seen if status else None)
+    return users
+
+
+def flush():
+    """
+    Copy the cached presence of every user into UserStatus with one
+    bulk_update, and clear users whose connections expired without a
+    disconnect. Returns those users so the caller can announce them offline.
+    """
+    statuses = list(UserStatus.objects.select_related('user'))
+    keys = []
+    for status in statuses:
+        keys += [_key(kind, status.user_id) for kind in ('connections', 'online', 'seen')]
+    found = cache.get_many(keys)
+
+    changed = []
+    expired = []
+    for status in statuses:
+        online = _key('online', status.user_id) in found
+        if online and not found.get(_key('connections', status.user_id)):
+            if cache.delete(_key('online', status.user_id)):
+                expired.append(status.user)
+            online = False
+        last_seen = found.get(_key('seen', status.user_id), status.last_seen)
+        if status.is_online != online or status.last_seen != last_seen:
+            status.is_online = online
+            status.last_seen = last_seen
+            changed.append(status)
+
+    # bulk_update writes last_seen as given (auto_now only applies on save())
+    UserStatus.objects.bulk_update(changed, ['is_online', 'last_seen'], batch_size=500)
+    return len(changed), expired
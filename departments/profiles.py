@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.db.models import BooleanField, ExpressionWrapper, Q
+
+from backend.core.cache_keys import versioned_key
+from .models import UserProfile
+
+# Seconds a loaded profile is reused; profile saves invalidate it sooner
+PROFILE_TIMEOUT = 300
+
+# Hashed role secrets never go into the shared cache; the dashboards only need
+# to know whether one is set (has_<field> attributes)
+SECRET_FIELDS = ('stream_password', 'department_password', 'floor_password')
+
+
+def _profile_key(user_id):
+    # Versioned, so department changes (and stream/floor changes, see
+    # signals.py) invalidate every cached profile at once
+    return versioned_key('profile', user_id)
+
+
+def get_profile(user):
+    """
+    `user`'s UserProfile with its department, stream and floor, from the
+    shared cache when possible; None if the user has no profile. The secret
+    fields are deferred (see SECRET_FIELDS).
+    """
+    if not user.is_authenticated:
+        return None
+    key = _profile_key(user.pk)
+    profile = cache.get(key)
+    if profile is None:
+        profile = (
+            UserProfile.objects.select_related('department', 'stream', 'floor')
+            .defer(*SECRET_FIELDS, 'floor__floor_password')
+            .annotate(**{
+                f'has_{field}': ExpressionWrapper(~Q(**{field: ''}), output_field=BooleanField())
+                for field in SECRET_FIELDS
+            })
+            .filter(user_id=user.pk)
+            .first()
+        )
+        # Cache misses too (as False), so users without a profile cost no query either
+        cache.set(key, profile or False, PROFILE_TIMEOUT)
+    if not profile:
+        return None
+    # Attach the request's user (never cached) both ways, so neither
+    # profile.user nor user.userprofile queries again
+    user.userprofile = profile
+    return profile
+
+
+def get_request_profile(request):
+    """The current user's profile, loaded once per request"""
+    if not hasattr(request, '_cached_profile'):
+        request._cached_profile = get_profile(request.user)
+    return request._cached_profile
+
+
+def invalidate_profile(user_id):
+    cache.delete(_profile_key(user_id))
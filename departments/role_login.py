@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import hmac
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+
+from . import login_limits
+from .models import UserProfile
+
+ROLE_SECRET_HASHER = 'pbkdf2_sha256_role'
+# Seconds a role secret that verified stays trusted without hashing it again
+VERIFIED_SECRET_TIMEOUT = 15 * 60
+
+LOGIN_OUTCOMES = ('success', 'failure')
+
+
+def verify_role_secret(profile, field, secret):
+    """
+    Check a stream/department/floor secret against the hash stored in
+    `profile.<field>`.
+
+    A secret that verified recently is recognised by an HMAC of it (keyed
+    with SECRET_KEY and bound to the stored hash, so changing the secret
+    forgets it) and needs no hashing at all. Otherwise it is hashed once
+    with the role tier; hashes from the slower account hasher are upgraded
+    to that tier on their first successful check.
+    """
+    # From the database: profiles cached for dashboards leave the hashes out
+    encoded = UserProfile.objects.filter(pk=profile.pk).values_list(field, flat=True).first()
+    if not secret or not encoded:
+        return False
+
+    message = f'{profile.pk}:{field}:{encoded}:{secret}'.encode()
+    key = 'role-secret:' + hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+    if cache.get(key):
+        return True
+
+    def upgrade(raw_secret):
+        new_encoded = make_password(raw_secret, hasher=ROLE_SECRET_HASHER)
+        UserProfile.objects.filter(pk=profile.pk).update(**{field: new_encoded})
+        setattr(profile, field, new_encoded)
+
+    if not check_password(secret, encoded, setter=upgrade, preferred=ROLE_SECRET_HASHER):
+        return False
+    cache.set(key, True, VERIFIED_SECRET_TIMEOUT)
+    return True
+
+
+def check_role_secret(request, username, profile, field, secret):
+    """
+    verify_role_secret() under the failed-login limits: nothing is hashed
+    while `username` or the client is locked out (request.login_retry_after
+    is set instead), and a wrong secret counts as a failed login.
+    """
+    seconds = login_limits.retry_after(request, username)
+    if seconds:
+        request.login_retry_after = seconds
+        return False
+    if verify_role_secret(profile, field, secret):
+        return True
+    login_limits.record_failure(request, username)
+    return False
+
+
+def update_profile_selection(profile, **selection):
+    """Store the stream/floor picked at login, writing only the fields that changed"""
+    changed = [
+        field for field, value in selection.items()
+        if value is not None and getattr(profile, f'{field}_id') != value.pk
+    ]
+    for field in changed:
+        setattr(profile, field, selection[field])
+    if changed:
+        profile.save(update_fields=changed)
+
+
+# --- TIMING METRICS ---
+
+def _add(key, amount):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.add(key, amount, None)
+
+
+def record_login(outcome, seconds):
+    """Count a login attempt and its duration in the shared cache"""
+    _add(f'login-metrics:{outcome}:count', 1)
+    _add(f'login-metrics:{outcome}:ms', round(seconds * 1000))
+
+
+def login_metrics():
+    """Attempts and average duration per outcome, across all workers"""
+    keys = [f'login-metrics:{outcome}:{kind}' for outcome in LOGIN_OUTCOMES for kind in ('count', 'ms')]
+    values = cache.get_many(keys)
+    metrics = {}
+    for outcome in LOGIN_OUTCOMES:
+        count = values.get(f'login-metrics:{outcome}:count', 0)
+        total_ms = values.get(f'login-metrics:{outcome}:ms', 0)
+        metrics[outcome] = {
+            'count': count,
+            'avg_ms': round(total_ms / count, 1) if count else None,
+        }
+    return metrics
+
+
+def timed_login(view):
+    """Record the duration of every login POST, split by whether it signed the user in"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view(request, *args, **kwargs)
+        started = time.perf_counter()
+        response = view(request, *args, **kwargs)
+        outcome = 'success' if request.user.is_authenticated and response.status_code == 302 else 'failure'
+        record_login(outcome, time.perf_counter() - started)
+        return response
+
+    return wrapper
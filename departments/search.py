@@ -0,0 +1,84 @@
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import Message
+
+# Results per search page
+SEARCH_PAGE_SIZE = 20
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def search_messages(user_id, query, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Messages `user_id` sent or received that match `query`, best match first,
+    through the full-text index created in migration 0007. Returns (messages
+    for the page, whether there is a next page).
+    """
+    words = WORD.findall(query)
+    if not words:
+        return [], False
+    offset = (page - 1) * per_page
+
+    if connection.vendor == 'postgresql':
+        ids = _search_postgresql(user_id, query, offset, per_page + 1)
+    elif connection.vendor == 'sqlite':
+        ids = _search_sqlite(user_id, words, offset, per_page + 1)
+    else:
+        ids = _search_fallback(user_id, words, offset, per_page + 1)
+
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    messages = Message.objects.select_related('sender', 'receiver').in_bulk(ids)
+    return [messages[message_id] for message_id in ids if message_id in messages], has_next
+
+
+def _search_sqlite(user_id, words, offset, limit):
+    # Every word must match; the last one also as a prefix, for search-as-you-type.
+    # Words are quoted so FTS5 never reads user input as query syntax.
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT message.id
+            FROM departments_message_fts
+            JOIN departments_message AS message ON message.id = departments_message_fts.rowid
+            WHERE departments_message_fts MATCH %s
+              AND (message.sender_id = %s OR message.receiver_id = %s)
+            ORDER BY bm25(departments_message_fts), message.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [' '.join(terms), user_id, user_id, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_postgresql(user_id, query, offset, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    # Same expression as the GIN index, so the index answers the match
+    vector = SearchVector('content', config='english')
+    search_query = SearchQuery(query, config='english', search_type='websearch')
+    return list(
+        Message.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id))
+        .annotate(search=vector, rank=SearchRank(vector, search_query))
+        .filter(search=search_query)
+        .order_by(F('rank').desc(), '-id')
+        .values_list('id', flat=True)[offset:offset + limit]
+    )
+
+
+def _search_fallback(user_id, words, offset, limit):
+    # Other databases have no index here: newest matches first
+    matches = Q()
+    for word in words:
+        matches &= Q(content__icontains=word)
+    return list(
+        Message.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id))
+        .filter(matches)
+        .order_by('-id')
+        .values_list('id', flat=True)[offset:offset + limit]
+    )
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.core.cache_keys import bump_data_version
+from . import login_limits
+from .chat import CHAT_USER_IDS_KEY
+from .groups import sync_memberships
+from .models import ChatGroupMember, Floor, Stream, UserProfile, UserStatus
+from .profiles import invalidate_profile
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_user_status(sender, instance, created, raw=False, **kwargs):
+    # Every user gets a presence row once, when the account is created, so the
+    # chat pages never have to create them. Users added with bulk_create get
+    # theirs from the backfill_user_status command.
+    if created and not raw:
+        UserStatus.objects.bulk_create([UserStatus(user=instance)], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_chat_user_ids(sender, update_fields=None, **kwargs):
+    # New, deactivated or deleted users change who can receive messages;
+    # logins (which only save last_login) do not
+    if update_fields != frozenset({'last_login'}):
+        cache.delete(CHAT_USER_IDS_KEY)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_chat_user_ids_for_profile(sender, created=False, **kwargs):
+    # Only users with a profile can receive messages
+    if created or kwargs['signal'] is post_delete:
+        cache.delete(CHAT_USER_IDS_KEY)
+
+
+@receiver(post_save, sender=UserProfile)
+def sync_chat_groups(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Department, floor and role decide which group rooms the user is in
+    if raw or (update_fields is not None and not {'role', 'department', 'floor'} & set(update_fields)):
+        return
+    sync_memberships(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+
+
+@receiver(post_save, sender=Stream)
+@receiver(post_save, sender=Floor)
+@receiver(post_delete, sender=Stream)
+@receiver(post_delete, sender=Floor)
+def invalidate_cached_profiles(sender, **kwargs):
+    # Cached profiles carry their stream and floor
+    bump_data_version()
+
+
+@receiver(post_delete, sender=UserProfile)
+def leave_chat_groups(sender, instance, **kwargs):
+    ChatGroupMember.objects.filter(user_id=instance.user_id).delete()
+
+
+@receiver(user_login_failed)
+def count_failed_login(sender, credentials, request=None, **kwargs):
+    # Attempts the rate limit rejected are not counted again, so a lockout
+    # ends one window after the last real failure
+    if request is None or getattr(request, 'login_retry_after', None):
+        return
+    login_limits.record_failure(request, credentials.get('username'))
+
+
+@receiver(user_logged_in)
+def reset_failed_logins(sender, request, user, **kwargs):
+    login_limits.clear_username(user.get_username())
@@ -1,3 +1,251 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import chat, login_limits
+from .consumers import ChatConsumer
+from .models import ChatGroup, ChatGroupMember, Conversation, Floor, Message, UserProfile
+
+
+class ChatCounterTests(TestCase):
+    """Conversation counters kept by chat.record_message() and chat.mark_read()"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice = User.objects.create_user(username='alice', password='!')
+        cls.bob = User.objects.create_user(username='bob', password='!')
+
+    def conversation(self):
+        return Conversation.objects.get(user_a=self.alice, user_b=self.bob)
+
+    def test_record_message_counts_unread_for_the_receiver(self):
+        chat.record_message(self.alice.id, self.bob.id, 'one')
+        chat.record_message(self.alice.id, self.bob.id, 'two')
+        last = chat.record_message(self.bob.id, self.alice.id, 'three')
+
+        conversation = self.conversation()
+        self.assertEqual(conversation.unread_for(self.bob.id), 2)
+        self.assertEqual(conversation.unread_for(self.alice.id), 1)
+        self.assertEqual(conversation.last_message, last)
+        self.assertEqual(conversation.last_message_preview, 'three')
+        self.assertEqual(chat.total_unread(self.bob.id), 2)
+
+    def test_record_messages_matches_record_message(self):
+        chat.record_messages([
+            (self.alice.id, self.bob.id, 'one'),
+            (self.alice.id, self.bob.id, 'two'),
+            (self.bob.id, self.alice.id, 'three'),
+        ])
+        conversation = self.conversation()
+        self.assertEqual((conversation.unread_for(self.bob.id), conversation.unread_for(self.alice.id)), (2, 1))
+        self.assertEqual(conversation.last_message_preview, 'three')
+
+    def test_mark_read_up_to_keeps_later_messages_unread(self):
+        first, second, third = [chat.record_message(self.alice.id, self.bob.id, text) for text in ('1', '2', '3')]
+
+        self.assertEqual(chat.mark_read(self.bob.id, self.alice.id, up_to=second.id), 2)
+        self.assertEqual(self.conversation().unread_for(self.bob.id), 1)
+        self.assertEqual(list(Message.objects.filter(is_read=False)), [third])
+
+        self.assertEqual(chat.mark_read(self.bob.id, self.alice.id), 1)
+        self.assertEqual(chat.total_unread(self.bob.id), 0)
+
+    def test_mark_read_with_nothing_unread_writes_nothing(self):
+        chat.record_message(self.alice.id, self.bob.id, 'one')
+        # bob has sent alice nothing
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(chat.mark_read(self.alice.id, self.bob.id), 0)
+        self.assertFalse([query for query in queries if 'departments_conversation' in query['sql']])
+        self.assertEqual(self.conversation().unread_for(self.bob.id), 1)
+
+
+class ChatContactsTests(TestCase):
+    """The contact list offers only the users the chat socket accepts as receivers"""
+
+    def test_contacts_match_chat_user_ids(self):
+        cache.clear()
+        User = get_user_model()
+        me, colleague, inactive, no_profile = [
+            User.objects.create_user(username=name, password='!')
+            for name in ('me', 'colleague', 'inactive', 'no-profile')
+        ]
+        for user in (me, colleague, inactive):
+            UserProfile.objects.create(user=user, role='Teacher')
+        inactive.is_active = False
+        inactive.save()
+
+        self.assertEqual(list(chat.chat_contacts(me.id)), [colleague])
+        self.assertEqual(chat.chat_user_ids(), {me.id, colleague.id})
+
+
+@override_settings(
+    LOGIN_ATTEMPTS_PER_USERNAME=3,
+    LOGIN_ATTEMPTS_PER_IP=5,
+    LOGIN_ATTEMPT_WINDOW=100,
+    LOGIN_PROXY_HOPS=0,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher', 'departments.hashers.RoleSecretHasher'],
+)
+class LoginLimitTests(TestCase):
+    """Failed-login window and lockout in login_limits and LoginRateLimitBackend"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='alice', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        # Start of a window bucket, so tests control how far into it they are
+        self.now = 1000.0
+        patcher = mock.patch('departments.login_limits.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, ip='10.0.0.1', **meta):
+        return RequestFactory().post('/login/', REMOTE_ADDR=ip, **meta)
+
+    def fail(self, username='alice', times=1, ip='10.0.0.1'):
+        for _ in range(times):
+            self.assertIsNone(authenticate(self.request(ip), username=username, password='wrong'))
+
+    def test_username_is_locked_out_at_the_limit(self):
+        self.fail(times=2)
+        self.assertEqual(login_limits.retry_after(self.request(), 'alice'), 0)
+        self.fail()
+        self.assertEqual(login_limits.retry_after(self.request(), 'Alice '), 100)
+
+        # The right password is not even checked while locked out
+        request = self.request()
+        self.assertIsNone(authenticate(request, username='alice', password='secret'))
+        self.assertEqual(request.login_retry_after, 100)
+        self.assertEqual(login_limits.limit_metrics()['blocked']['username'], 2)
+
+    def test_ip_is_locked_out_across_usernames(self):
+        for number in range(5):
+            self.fail(username=f'user-{number}')
+        self.assertGreater(login_limits.retry_after(self.request(), 'someone-else'), 0)
+        self.assertEqual(login_limits.retry_after(self.request('10.0.0.2'), 'someone-else'), 0)
+
+    def test_previous_bucket_fades_out_over_the_window(self):
+        self.fail(times=3)
+        self.now += 100
+        # Whole previous bucket still inside the window
+        self.assertEqual(login_limits.failed_attempts('username', 'alice'), 3)
+        self.now += 50
+        self.assertEqual(login_limits.failed_attempts('username', 'alice'), 1.5)
+        self.assertEqual(login_limits.retry_after(self.request(), 'alice'), 0)
+        self.now += 50
+        self.assertEqual(login_limits.failed_attempts('username', 'alice'), 0)
+
+    def test_signing_in_clears_the_username_but_not_the_ip(self):
+        self.fail(times=2)
+        self.assertIsNotNone(authenticate(self.request(), username='alice', password='secret'))
+        self.client.force_login(self.user)
+        self.assertEqual(login_limits.failed_attempts('username', 'alice'), 0)
+        self.assertEqual(login_limits.failed_attempts('ip', '10.0.0.1'), 2)
+
+    def test_wrong_role_secret_counts_as_a_failed_login(self):
+        floor = Floor.objects.create(name='First')
+        UserProfile.objects.create(
+            user=self.user, role='Discipline Master', floor=floor, floor_password=make_password('floor-secret'),
+        )
+        data = {
+            'username': 'alice', 'password': 'secret', 'role': 'Discipline Master',
+            'floor': floor.pk, 'floor_password': 'wrong',
+        }
+        for _ in range(3):
+            self.client.post(reverse('admin_login'), data, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(login_limits.failed_attempts('username', 'alice'), 3)
+
+        # Locked out: the right secret is not checked either
+        with mock.patch('departments.role_login.verify_role_secret') as verify:
+            response = self.client.post(
+                reverse('admin_login'), {**data, 'floor_password': 'floor-secret'}, REMOTE_ADDR='10.0.0.1',
+            )
+        verify.assert_not_called()
+        self.assertContains(response, 'Too many failed login attempts')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    @override_settings(LOGIN_PROXY_HOPS=1)
+    def test_client_ip_behind_a_proxy(self):
+        request = self.request('10.0.0.9', HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.7')
+        self.assertEqual(login_limits.client_ip(request), '203.0.113.7')
+        self.assertEqual(login_limits.client_ip(self.request('10.0.0.9')), '10.0.0.9')
+
+    def test_unconfigured_proxy_address_is_not_limited(self):
+        # Every client arrives from the proxy's address while LOGIN_PROXY_HOPS is 0
+        for number in range(5):
+            request = RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.9', HTTP_X_FORWARDED_FOR=f'203.0.113.{number}')
+            self.assertIsNone(authenticate(request, username=f'user-{number}', password='wrong'))
+        self.assertEqual(login_limits.failed_attempts('ip', '10.0.0.9'), 0)
+        self.assertEqual(login_limits.retry_after(self.request('10.0.0.9', HTTP_X_FORWARDED_FOR='198.51.100.1'), 'alice'), 0)
+
+
+class HomePageCacheTests(TestCase):
+    """The cached landing page is not shared between visitors"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_visitor_does_not_get_a_signed_in_page(self):
+        user = get_user_model().objects.create_user(username='signed-in-visitor', password='!')
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('home')), 'signed-in-visitor')
+
+        self.assertNotContains(Client().get(reverse('home')), 'signed-in-visitor')
+        # And the anonymous copy is not served back to the signed-in user
+        self.assertContains(self.client.get(reverse('home')), 'signed-in-visitor')
+
+
+class ChatBenchmarkCommandTests(TransactionTestCase):
+    """manage.py chat_benchmark still completes a round (it builds its own database)"""
+
+    def test_smoke(self):
+        output = StringIO()
+        call_command('chat_benchmark', users=2, rounds=1, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual((report['users'], report['messages']), (2, 1))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class GroupMessageSocketTests(TestCase):
+    """Group messages sent over ChatConsumer"""
+
+    def test_message_to_a_deleted_group_gets_an_error_frame(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username='member', password='!')
+        group = ChatGroup.objects.create(kind='role', key='Teacher', name='Teachers')
+        ChatGroupMember.objects.create(group=group, user=user)
+
+        async def scenario():
+            communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            group_id = group.pk
+            await database_sync_to_async(group.delete)()
+
+            await communicator.send_json_to({'type': 'group_message', 'group_id': group_id, 'message': 'hi', 'client_id': 7})
+            while True:
+                frame = await communicator.receive_json_from()
+                if frame['type'] == 'message_error':
+                    break
+            self.assertEqual((frame['client_id'], frame['error']), (7, 'This group no longer exists'))
+            # The socket is still open
+            await communicator.send_json_to({'type': 'group_message', 'group_id': group_id, 'message': 'hi', 'client_id': 8})
+            self.assertEqual((await communicator.receive_json_from())['error'], 'Not a member of this group')
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
@@ -0,0 +1,211 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import ChatUpload
+
+# Largest attachment accepted, and the most a single chunk request may carry
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+CHUNK_BYTES = 1024 * 1024
+# Bytes read from the request or a file per iteration; nothing is held whole in memory
+READ_BYTES = 64 * 1024
+# Longest side of image previews shown in the chat
+THUMBNAIL_SIZE = (320, 320)
+
+
+class UploadError(Exception):
+    """A chunk or upload the client has to correct (HTTP 400/409)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_path(upload):
+    """Local file the chunks of an unfinished upload are appended to"""
+    return os.path.join(settings.MEDIA_ROOT, 'chat_uploads', 'partial', f'{upload.upload_id}.part')
+
+
+def start_upload(owner, name, size):
+    """Register an upload of `size` bytes; chunks are then sent with append_chunk()"""
+    if size <= 0 or size > MAX_UPLOAD_BYTES:
+        raise UploadError(f'Files must be between 1 byte and {MAX_UPLOAD_BYTES // (1024 * 1024)} MB')
+    return ChatUpload.objects.create(owner=owner, name=os.path.basename(name)[:255], size=size)
+
+
+def append_chunk(upload_id, owner, offset, stream, length):
+    """
+    Append `length` bytes read from `stream` at byte `offset`, which must be
+    what the server already has (a resumed upload asks for it first). The
+    last chunk completes the upload; an empty chunk at the end finishes one
+    whose completion was interrupted. Returns the updated ChatUpload.
+    """
+    if length < 0 or length > CHUNK_BYTES:
+        raise UploadError(f'Chunks must be between 1 byte and {CHUNK_BYTES} bytes')
+
+    with transaction.atomic():
+        # The row lock serialises retries of the same chunk
+        upload = ChatUpload.objects.select_for_update().filter(upload_id=upload_id, owner=owner).first()
+        if upload is None:
+            raise UploadError('Unknown upload', status=404)
+        if upload.status == 'COMPLETE':
+            return upload
+
+        path = partial_path(upload)
+        on_disk = os.path.getsize(path) if os.path.exists(path) else 0
+        if on_disk < upload.received:
+            # Partial file lost or cut short: resume from what is really there
+            upload.received = on_disk
+            upload.save(update_fields=['received'])
+        if offset != upload.received:
+            raise UploadError(f'Expected offset {upload.received}', status=409)
+        if upload.received + length > upload.size:
+            raise UploadError('Chunk goes past the declared size')
+        if length == 0 and upload.received < upload.size:
+            raise UploadError(f'Chunks must be between 1 byte and {CHUNK_BYTES} bytes')
+
+        if length:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            written = 0
+            with open(path, 'ab') as partial:
+                partial.truncate(offset)  # drop the tail of a chunk that failed midway
+                while written < length:
+                    data = stream.read(min(READ_BYTES, length - written))
+                    if not data:
+                        break
+                    partial.write(data)
+                    written += len(data)
+            if written != length:
+                raise UploadError('Chunk shorter than its Content-Length')
+
+            upload.received += length
+            upload.save(update_fields=['received'])
+
+    # Hashing and storing up to MAX_UPLOAD_BYTES happens after the row lock is released
+    if upload.received == upload.size:
+        upload = _complete(upload, path)
+    return upload
+
+
+def store_file(owner, uploaded_file):
+    """Store a file sent in one request (the plain upload form) the same way as chunks"""
+    if uploaded_file.size > MAX_UPLOAD_BYTES:
+        raise UploadError(f'Files must be at most {MAX_UPLOAD_BYTES // (1024 * 1024)} MB')
+    upload = start_upload(owner, uploaded_file.name, uploaded_file.size)
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as partial:
+        for data in uploaded_file.chunks(READ_BYTES):
+            partial.write(data)
+    upload.received = upload.size
+    upload.save(update_fields=['received'])
+    return _complete(upload, path)
+
+
+def _complete(upload, path):
+    """
+    Hash the finished file and store it, reusing an identical earlier
+    upload. The file work runs without locks; only the final status change
+    locks the row. Returns the completed ChatUpload.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as partial:
+            for data in iter(lambda: partial.read(READ_BYTES), b''):
+                digest.update(data)
+    except FileNotFoundError:
+        # Another request finished it first, or the partial file was lost
+        # (the next chunk request then resumes from what is on disk)
+        upload.refresh_from_db()
+        if upload.status == 'COMPLETE':
+            return upload
+        raise UploadError('Upload data lost, resend it', status=409)
+    sha256 = digest.hexdigest()
+
+    duplicate = (
+        ChatUpload.objects.filter(sha256=sha256, status='COMPLETE')
+        .exclude(file='').order_by('id').first()
+    )
+    if duplicate is not None:
+        # Same bytes already stored: point at them instead of storing a copy
+        file_name, thumbnail_name = duplicate.file.name, duplicate.thumbnail.name
+    else:
+        extension = os.path.splitext(upload.name)[1].lower()
+        with open(path, 'rb') as partial:
+            upload.file.save(f'{sha256}{extension}', File(partial), save=False)
+        file_name, thumbnail_name = upload.file.name, ''
+
+    with transaction.atomic():
+        upload = ChatUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != 'COMPLETE':
+            upload.received = upload.size
+            upload.sha256 = sha256
+            upload.file.name = file_name
+            upload.thumbnail.name = thumbnail_name
+            upload.status = 'COMPLETE'
+            upload.completed_at = timezone.now()
+            upload.save(update_fields=['received', 'sha256', 'file', 'thumbnail', 'status', 'completed_at'])
+
+            if upload.is_image and not upload.thumbnail:
+                upload_pk = upload.pk
+                transaction.on_commit(lambda: _get_pool().submit(make_thumbnail, upload_pk))
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return upload
+
+
+_pool = None
+
+
+def _get_pool():
+    """Thumbnails are made on a small thread pool so the upload request returns at once"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-thumbnails')
+    return _pool
+
+
+def make_thumbnail(upload_pk):
+    """Create the preview image for a stored upload (and its duplicates)"""
+    try:
+        upload = ChatUpload.objects.get(pk=upload_pk)
+        with upload.file.open('rb') as source:
+            image = Image.open(source)
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = BytesIO()
+            image.save(buffer, format='JPEG', quality=80)
+        upload.thumbnail.save(f'{upload.sha256}.jpg', ContentFile(buffer.getvalue()), save=False)
+        ChatUpload.objects.filter(sha256=upload.sha256, thumbnail='').update(thumbnail=upload.thumbnail.name)
+    except (OSError, Image.DecompressionBombError):
+        # Not a readable image: the preview falls back to the file itself
+        pass
+    finally:
+        close_old_connections()
+
+
+def upload_to_dict(upload):
+    """JSON-ready state of an upload, for starting, resuming and finishing it"""
+    complete = upload.status == 'COMPLETE'
+    return {
+        'upload_id': str(upload.upload_id),
+        'name': upload.name,
+        'size': upload.size,
+        'received': upload.received,
+        'chunk_size': CHUNK_BYTES,
+        'complete': complete,
+        'url': upload.file.url if complete else None,
+        'type': 'image' if upload.is_image else 'file',
+    }
@@ -7,6 +7,7 @@ urlpatterns = [
     path('admin-login/', views.custom_admin_login, name='admin_login'),
     path('principal-login/', views.principal_login, name='principal_login'),
     path('teacher-login/', views.teacher_login, name='teacher_login'),
+    path('login-metrics/', views.login_metrics_view, name='login_metrics'),
     
     # Dashboard router
     path('dashboard/', views.dashboard_router, name='dashboard_router'),
@@ -55,10 +56,19 @@ urlpatterns = [
     # System URLs
     path('logout/', views.custom_logout, name='logout'),
     path('unauthorized/', views.unauthorized, name='unauthorized'),
+    path('healthz/', views.healthz, name='healthz'),
 
     # ==================== CHAT SYSTEM URLS ====================
     path('chat/', views.chat_list, name='chat_list'),
     path('chat/private/<int:user_id>/', views.private_chat, name='private_chat'),
+    path('chat/private/<int:user_id>/history/', views.chat_history, name='chat_history'),
+    path('chat/inbox/', views.chat_inbox, name='chat_inbox'),
+    path('chat/search/', views.chat_search, name='chat_search'),
+    path('chat/groups/', views.chat_groups, name='chat_groups'),
+    path('chat/groups/<int:group_id>/history/', views.group_history, name='group_history'),
     path('chat/upload/', views.upload_chat_file, name='upload_chat_file'),
+    path('chat/uploads/', views.start_chat_upload, name='start_chat_upload'),
+    path('chat/uploads/<uuid:upload_id>/', views.chat_upload_chunk, name='chat_upload_chunk'),
+    path('chat/uploads/<uuid:upload_id>/preview/', views.chat_upload_preview, name='chat_upload_preview'),
     path('staff-chat/', views.staff_chat_dashboard, name='staff_chat_dashboard'),
 ]
\ No newline at end of file
@@ -1,28 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth import logout as auth_logout
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 User = get_user_model()
 import random
 import string
-from django.db.models import Q
+from django.db.models import Count
 from django.utils import timezone
 from datetime import timedelta
 from .forms import AdminLoginForm, PrincipalLoginForm, TeacherLoginForm, DepartmentCreationForm, UserCreationForm, ClassCreationForm, UserEditForm, DepartmentEditForm
 from backend.core.models import Department  # Changed import
-from .models import UserProfile, Stream, Floor, Message, UserStatus  # Removed Department from here
+from .models import UserProfile, Stream, Floor, ChatUpload, ChatGroupMember  # Removed Department from here
+from . import metrics, chat, groups, presence, search, uploads
 from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.core.files.storage import default_storage
+from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_cookie
+from backend.core.views import PUBLIC_PAGE_TIMEOUT
+from django.urls import reverse
+from .role_login import check_role_secret, login_metrics, timed_login, update_profile_selection
+from .login_limits import limit_metrics
+from .decorators import role_required
+
+@timed_login
 def custom_admin_login(request):
     if request.method == 'POST':
         form = AdminLoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
             role = form.cleaned_data.get('role')
             department = form.cleaned_data.get('department')
             stream = form.cleaned_data.get('stream')
@@ -31,8 +36,8 @@ def custom_admin_login(request):
             department_password = form.cleaned_data.get('department_password')
             floor_password = form.cleaned_data.get('floor_password')
             
-            # Authenticate user
-            user = authenticate(request, username=username, password=password)
+            # The form already authenticated the user (one password hash)
+            user = form.get_user()
             
             if user is not None:
                 try:
@@ -52,15 +57,10 @@ def custom_admin_login(request):
                         
                         # Check stream password
                         if stream_password and profile.stream_password:
-                            if not check_password(stream_password, profile.stream_password):
+                            if not check_role_secret(request, user.get_username(), profile, 'stream_password', stream_password):
                                 form.add_error('stream_password', 'Invalid stream password.')
                         else:
                             form.add_error('stream_password', 'Stream password is required.')
-                            
-                        # Save stream selection
-                        if stream:
-                            profile.stream = stream
-                            profile.save()
                     
                     elif role == 'Chief of Works':
                         # Check if department is Industrial or Commercial
@@ -69,7 +69,7 @@ def custom_admin_login(request):
                         
                         # Check department password
                         if department_password and profile.department_password:
-                            if not check_password(department_password, profile.department_password):
+                            if not check_role_secret(request, user.get_username(), profile, 'department_password', department_password):
                                 form.add_error('department_password', 'Invalid department password.')
                         else:
                             form.add_error('department_password', 'Department password is required.')
@@ -77,17 +77,24 @@ def custom_admin_login(request):
                     elif role == 'Discipline Master':
                         # Check floor password (optional)
                         if floor_password and profile.floor_password:
-                            if not check_password(floor_password, profile.floor_password):
+                            if not check_role_secret(request, user.get_username(), profile, 'floor_password', floor_password):
                                 form.add_error('floor_password', 'Invalid floor password.')
-                        
-                        # Save floor selection
-                        if floor:
-                            profile.floor = floor
-                            profile.save()
                     
                     # For Secretary and Accountant, no department selection at login
                     # For Senior Discipline Master, no floor selection at login
                     
+                    # A wrong role secret stops the login
+                    if form.errors:
+                        if getattr(request, 'login_retry_after', None):
+                            form.add_error(None, form.get_invalid_login_error())
+                        return render(request, 'departments/custom_login.html', {'form': form})
+                    
+                    # Save the stream/floor selection (only when it changed)
+                    if role == 'Vice Principal':
+                        update_profile_selection(profile, stream=stream)
+                    elif role == 'Discipline Master':
+                        update_profile_selection(profile, floor=floor)
+                    
                     # Login user
                     login(request, user)
                     
@@ -132,15 +139,21 @@ def custom_admin_login(request):
     
     return render(request, 'departments/custom_login.html', {'form': form})
 
+@login_required
+def login_metrics_view(request):
+    """Login attempts, durations and rate limit counters across all workers, as JSON (superusers only)"""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    return JsonResponse({'logins': login_metrics(), 'rate_limit': limit_metrics()})
+
+@timed_login
 def principal_login(request):
     if request.method == 'POST':
         form = PrincipalLoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
             
-            # Authenticate user
-            user = authenticate(request, username=username, password=password)
+            # The form already authenticated the user (one password hash)
+            user = form.get_user()
             
             if user is not None:
                 try:
@@ -171,15 +184,14 @@ def principal_login(request):
     
     return render(request, 'departments/principal_login.html', {'form': form})
 
+@timed_login
 def teacher_login(request):
     if request.method == 'POST':
         form = TeacherLoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
             
-            # Authenticate user
-            user = authenticate(request, username=username, password=password)
+            # The form already authenticated the user (one password hash)
+            user = form.get_user()
             
             if user is not None:
                 try:
@@ -212,54 +224,48 @@ def teacher_login(request):
 
 @login_required
 def dashboard_router(request):
-    try:
-        profile = request.user.userprofile
-        # Route to appropriate dashboard based on role
-        if profile.role == 'Principal':
-            return redirect('principal_dashboard')
-        elif profile.role == 'Vice Principal':
-            return redirect('vice_principal_dashboard')
-        elif profile.role == 'Chief of Works':
-            return redirect('chief_of_works_dashboard')
-        elif profile.role == 'Discipline Master':
-            return redirect('discipline_master_dashboard')
-        elif profile.role == 'Senior Discipline Master':
-            return redirect('discipline_master_dashboard')
-        elif profile.role == 'Secretary':
-            return redirect('secretary_dashboard')
-        elif profile.role == 'Accountant':
-            return redirect('accountant_dashboard')
-        elif profile.role == 'Teacher':
-            return redirect('teacher_dashboard')
-        else:
-            return redirect('custom_admin_login')
-    except UserProfile.DoesNotExist:
-        return redirect('custom_admin_login')
+    profile = request.profile
+    if not profile:
+        return redirect('admin_login')
+    # Route to appropriate dashboard based on role
+    if profile.role == 'Principal':
+        return redirect('principal_dashboard')
+    elif profile.role == 'Vice Principal':
+        return redirect('vice_principal_dashboard')
+    elif profile.role == 'Chief of Works':
+        return redirect('chief_of_works_dashboard')
+    elif profile.role == 'Discipline Master':
+        return redirect('discipline_master_dashboard')
+    elif profile.role == 'Senior Discipline Master':
+        return redirect('discipline_master_dashboard')
+    elif profile.role == 'Secretary':
+        return redirect('secretary_dashboard')
+    elif profile.role == 'Accountant':
+        return redirect('accountant_dashboard')
+    elif profile.role == 'Teacher':
+        return redirect('teacher_dashboard')
+    else:
+        return redirect('admin_login')
 
 # ==================== NEW DASHBOARD VIEWS ====================
 
-@login_required
+@role_required('Principal')
 def principal_dashboard(request):
-    # Check if user is authorized as Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
-    # Get counts for dashboard
-    total_users = UserProfile.objects.count()
-    total_departments = Department.objects.count()
+    # School-wide counts come from the cached metrics layer
+    school = metrics.school_metrics()
+    total_departments = school['total_departments']
+    total_classes = school['total_classes']
+    total_students = school['total_students']
     
     # Get actual data
-    departments = Department.objects.all().prefetch_related('stream_set')
-    users = UserProfile.objects.all().select_related('user', 'department')
-    
-    # Note: For classes and students, you'll need to integrate with your core app
-    # For now, we'll use placeholders
-    total_classes = 0
-    total_students = 0
+    # Per-department class/student counts and user counts in one query
+    departments = Department.objects.with_stats().annotate(
+        user_count=Count('userprofile')
+    ).prefetch_related('stream_set').order_by('name')
+    users = list(UserProfile.objects.all().select_related('user', 'department'))
+    total_users = len(users)
     
     # Prepare context for principal dashboard
     context = {
@@ -274,27 +280,27 @@ def principal_dashboard(request):
     }
     return render(request, 'departments/principal_dashboard.html', context)
 
-@login_required
+@role_required('Vice Principal')
 def vice_principal_dashboard(request):
-    # Check if user is authorized as Vice Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Vice Principal':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     # Get stream password (for display purposes only)
-    stream_password_display = "stream123" if hasattr(profile, 'stream_password') and profile.stream_password else "Not set"
-    
-    # Get statistics for the dashboard
-    student_count = 42  # Example data - replace with actual query
-    teacher_count = 8   # Example data
+    stream_password_display = "stream123" if profile.has_stream_password else "Not set"
+    
+    # Get statistics for the dashboard (the stream's department, or the whole school)
+    school = metrics.school_metrics()
+    if profile.stream_id:
+        stream_department = metrics.department_metrics(profile.stream.department_id)
+        student_count = stream_department['students']
+        teacher_count = stream_department['teachers']
+    else:
+        student_count = school['total_students']
+        teacher_count = school['total_teachers']
     attendance_rate = 94.5  # Example data
     pass_rate = 87.3  # Example data
     
-    student_count_change = 3  # Example: +3 students since last week
-    teacher_count_change = 1  # Example: +1 teacher
+    student_count_change = school['new_students_this_week']
+    teacher_count_change = school['new_teachers_this_week']
     attendance_change = 1.2  # Example: +1.2%
     pass_rate_change = 2.5  # Example: +2.5%
     
@@ -363,22 +369,19 @@ def vice_principal_dashboard(request):
     }
     return render(request, 'departments/vice_principal_dashboard.html', context)
 
-@login_required
+@role_required('Chief of Works')
 def chief_of_works_dashboard(request):
-    # Check if user is authorized as Chief of Works
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Chief of Works':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     # Get department password (for display purposes only)
-    department_password_display = "dept123" if hasattr(profile, 'department_password') and profile.department_password else "Not set"
+    department_password_display = "dept123" if profile.has_department_password else "Not set"
     
     # Get department-specific statistics
     workshop_count = 5  # Example: 5 active workshops
-    student_count = 65  # Example: 65 technical students
+    if profile.department_id:
+        student_count = metrics.department_metrics(profile.department_id)['students']
+    else:
+        student_count = metrics.school_metrics()['total_students']
     equipment_count = 127  # Example: 127 equipment items
     maintenance_count = 8  # Example: 8 pending maintenance requests
     
@@ -449,18 +452,12 @@ def chief_of_works_dashboard(request):
     }
     return render(request, 'departments/chief_of_works_dashboard.html', context)
 
-@login_required
+@role_required('Discipline Master', 'Senior Discipline Master')
 def discipline_master_dashboard(request):
-    # Check if user is authorized as Discipline Master or Senior Discipline Master
-    try:
-        profile = request.user.userprofile
-        if profile.role not in ['Discipline Master', 'Senior Discipline Master']:
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     # Get floor password if available (for display purposes only)
-    floor_password_display = "floor123" if hasattr(profile, 'floor_password') and profile.floor_password else "Not required"
+    floor_password_display = "floor123" if profile.has_floor_password else "Not required"
     
     # Discipline statistics
     incident_count = 3  # Example: 3 incidents today
@@ -550,19 +547,13 @@ def discipline_master_dashboard(request):
     }
     return render(request, 'departments/discipline_master_dashboard.html', context)
 
-@login_required
+@role_required('Secretary')
 def secretary_dashboard(request):
-    # Check if user is authorized as Secretary
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Secretary':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     # Office statistics
     pending_documents = 8  # Example: 8 pending documents
-    unread_messages = 12  # Example: 12 unread messages
+    unread_messages = metrics.unread_message_count(request.user)
     upcoming_meetings = 3  # Example: 3 upcoming meetings
     urgent_tasks = 2  # Example: 2 urgent tasks
     
@@ -696,15 +687,9 @@ def secretary_dashboard(request):
     }
     return render(request, 'departments/secretary_dashboard.html', context)
 
-@login_required
+@role_required('Accountant')
 def accountant_dashboard(request):
-    # Check if user is authorized as Accountant
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Accountant':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     # Financial statistics
     total_revenue = 152500.75  # Example: $152,500.75
@@ -845,29 +830,18 @@ def accountant_dashboard(request):
     }
     return render(request, 'departments/accountant_dashboard.html', context)
 
-@login_required
+@role_required('Teacher')
 def teacher_dashboard(request):
-    # Check if user is authorized as Teacher
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Teacher':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
-    # Get assigned classes for the teacher (using dummy data)
-    assigned_classes = [
-        {'id': 1, 'name': 'Form 4B', 'subject': 'Mathematics', 'student_count': 38, 'schedule': 'Mon, Wed, Fri 8:00 AM', 'average_grade': 85.5, 'room': 'Room 401'},
-        {'id': 2, 'name': 'Form 3A', 'subject': 'Mathematics', 'student_count': 36, 'schedule': 'Tue, Thu 9:15 AM', 'average_grade': 78.2, 'room': 'Room 302'},
-        {'id': 3, 'name': 'Form 2C', 'subject': 'Mathematics', 'student_count': 35, 'schedule': 'Mon, Wed 10:30 AM', 'average_grade': 82.7, 'room': 'Room 203'},
-        {'id': 4, 'name': 'Form 1A', 'subject': 'Mathematics', 'student_count': 36, 'schedule': 'Tue, Thu 2:00 PM', 'average_grade': 88.1, 'room': 'Room 104'},
-    ]
+    # Classes assigned to this teacher, with student counts
+    assigned_classes = metrics.teacher_classes(request.user)
     
     # Teacher statistics
     total_students = sum([c['student_count'] for c in assigned_classes])
     pending_assignments = 8  # Example: 8 pending assignments to grade
     upcoming_exams = 3  # Example: 3 upcoming exams
-    unread_messages = 5  # Example: 5 unread messages
+    unread_messages = metrics.unread_message_count(request.user)
     
     assignment_change = 2  # Example: +2 assignments
     exam_change = 1  # Example: +1 exam
@@ -987,16 +961,9 @@ def teacher_dashboard(request):
 
 # ==================== SETUP VIEWS (For Principal Dashboard) ====================
 
-@login_required
+@role_required('Principal')
 def create_initial_departments(request):
     """View to create initial departments when system is first set up"""
-    # Check if user is Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
     
     # Define the 3 main departments
     departments_to_create = [
@@ -1054,16 +1021,10 @@ def create_initial_departments(request):
     
     return redirect('principal_dashboard')
 
-@login_required
+@role_required('Principal')
 def create_department_view(request):
     """View for creating a single department (quick create)"""
-    # Check if user is Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     if request.method == 'POST':
         form = DepartmentCreationForm(request.POST)
@@ -1084,17 +1045,10 @@ def create_department_view(request):
     }
     return render(request, 'departments/form_template.html', context)
 
-@login_required
+@role_required('Principal', redirect_to='principal_dashboard', message='Only Principal can edit departments.')
 def edit_department(request, department_id):
     """View for editing a department"""
-    # Check if user is Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            messages.error(request, 'Only Principal can edit departments.')
-            return redirect('principal_dashboard')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     department = get_object_or_404(Department, id=department_id)
     
@@ -1117,17 +1071,9 @@ def edit_department(request, department_id):
     }
     return render(request, 'departments/form_template.html', context)
 
-@login_required
+@role_required('Principal', redirect_to='principal_dashboard', message='Only Principal can delete departments.')
 def delete_department(request, department_id):
     """View for deleting a department"""
-    # Check if user is Principal (only Principal should delete departments)
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            messages.error(request, 'Only Principal can delete departments.')
-            return redirect('principal_dashboard')
-    except:
-        return redirect('unauthorized')
     
     try:
         # Get the department to delete
@@ -1150,16 +1096,10 @@ def delete_department(request, department_id):
     
     return redirect('principal_dashboard')
 
-@login_required
+@role_required('Principal')
 def create_user_view(request):
     """View for creating a new user (quick create)"""
-    # Check if user is Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     if request.method == 'POST':
         form = UserCreationForm(request.POST, request=request)
@@ -1180,17 +1120,10 @@ def create_user_view(request):
     }
     return render(request, 'departments/form_template.html', context)
 
-@login_required
+@role_required('Principal', redirect_to='principal_dashboard', message='Only Principal can edit users.')
 def edit_user(request, user_id):
     """View for editing a user"""
-    # Check if user is Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            messages.error(request, 'Only Principal can edit users.')
-            return redirect('principal_dashboard')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     user = get_object_or_404(User, id=user_id)
     user_profile = get_object_or_404(UserProfile, user=user)
@@ -1214,17 +1147,9 @@ def edit_user(request, user_id):
     }
     return render(request, 'departments/form_template.html', context)
 
-@login_required
+@role_required('Principal', redirect_to='principal_dashboard', message='Only Principal can delete users.')
 def delete_user(request, user_id):
     """View for deleting a user"""
-    # Check if user is Principal (only Principal should delete users)
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            messages.error(request, 'Only Principal can delete users.')
-            return redirect('principal_dashboard')
-    except:
-        return redirect('unauthorized')
     
     try:
         # Get the user to delete
@@ -1247,17 +1172,10 @@ def delete_user(request, user_id):
     
     return redirect('principal_dashboard')
 
-@login_required
+@role_required('Principal', redirect_to='principal_dashboard', message='Only Principal can reset passwords.')
 def reset_password(request, user_id):
     """View for resetting a user's password with copy/edit functionality"""
-    # Check if user is Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            messages.error(request, 'Only Principal can reset passwords.')
-            return redirect('principal_dashboard')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     try:
         # Get the user
@@ -1336,16 +1254,10 @@ def reset_password(request, user_id):
         messages.error(request, f'Error resetting password: {str(e)}')
         return redirect('principal_dashboard')
 
-@login_required
+@role_required('Principal')
 def create_class_view(request):
     """View for creating a new class (quick create)"""
-    # Check if user is Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role != 'Principal':
-            return redirect('unauthorized')
-    except:
-        return redirect('unauthorized')
+    profile = request.profile
     
     if request.method == 'POST':
         form = ClassCreationForm(request.POST)
@@ -1515,65 +1427,38 @@ def create_lesson_plan(request):
 
 # ==================== LEGACY DASHBOARD VIEWS (For backward compatibility) ====================
 
-@login_required
+@role_required('Vice Principal')
 def general_dashboard(request):
     # Legacy view - redirect to vice_principal_dashboard if user is Vice Principal
-    try:
-        profile = request.user.userprofile
-        if profile.role == 'Vice Principal':
-            return redirect('vice_principal_dashboard')
-    except:
-        pass
-    
-    return redirect('unauthorized')
+    return redirect('vice_principal_dashboard')
 
-@login_required
+@role_required('Chief of Works')
 def industrial_dashboard(request):
     # Legacy view - redirect to chief_of_works_dashboard if user is Chief of Works
-    try:
-        profile = request.user.userprofile
-        if profile.role == 'Chief of Works' and profile.department.name == "Industrial":
-            return redirect('chief_of_works_dashboard')
-    except:
-        pass
+    department = request.profile.department
+    if department and department.name == "Industrial":
+        return redirect('chief_of_works_dashboard')
     
     return redirect('unauthorized')
 
-@login_required
+@role_required('Chief of Works')
 def commercial_dashboard(request):
     # Legacy view - redirect to chief_of_works_dashboard if user is Chief of Works
-    try:
-        profile = request.user.userprofile
-        if profile.role == 'Chief of Works' and profile.department.name == "Commercial":
-            return redirect('chief_of_works_dashboard')
-    except:
-        pass
+    department = request.profile.department
+    if department and department.name == "Commercial":
+        return redirect('chief_of_works_dashboard')
     
     return redirect('unauthorized')
 
-@login_required
+@role_required('Discipline Master')
 def discipline_dashboard(request):
     # Legacy view - redirect to discipline_master_dashboard
-    try:
-        profile = request.user.userprofile
-        if profile.role == 'Discipline Master':
-            return redirect('discipline_master_dashboard')
-    except:
-        pass
-    
-    return redirect('unauthorized')
+    return redirect('discipline_master_dashboard')
 
-@login_required
+@role_required('Senior Discipline Master')
 def senior_discipline_dashboard(request):
     # Legacy view - redirect to discipline_master_dashboard
-    try:
-        profile = request.user.userprofile
-        if profile.role == 'Senior Discipline Master':
-            return redirect('discipline_master_dashboard')
-    except:
-        pass
-    
-    return redirect('unauthorized')
+    return redirect('discipline_master_dashboard')
 
 @login_required
 def admin_dashboard(request):
@@ -1588,6 +1473,14 @@ def admin_dashboard(request):
 def unauthorized(request):
     return render(request, 'departments/unauthorized.html')
 
+def healthz(request):
+    """Load balancer health check; answers even during maintenance"""
+    return JsonResponse({'status': 'ok'})
+
+# Static landing page; base.html's navigation differs per user, so the
+# cached copy varies on the session cookie as the core public pages do
+@cache_page(PUBLIC_PAGE_TIMEOUT)
+@vary_on_cookie
 def home_page(request):
     return render(request, 'departments/home_page.html')
 
@@ -1597,72 +1490,195 @@ def custom_logout(request):
 
 @login_required
 def chat_room(request):
-    # Fetch all users except the currently logged-in one
-    users = User.objects.exclude(id=request.user.id)
-    # Get all messages where the current user is either the sender OR the receiver
-    messages = Message.objects.filter(
-        Q(sender=request.user) | Q(receiver=request.user)
-    ).order_by('timestamp')
+    # All other users with their unread counts and live presence
+    users = presence.with_presence(chat.chat_contacts(request.user.id))
+    # The user's conversations, most recent first (one indexed query, no Message scan)
+    conversations = chat.inbox(request.user.id)
 
     return render(request, 'departments/chat.html', {
         'users': users, 
-        'messages': messages
+        'conversations': conversations
     })
 
 @login_required
 def private_chat(request, user_id):
     target_user = get_object_or_404(User, id=user_id)
     
-    # 1. Fetch the last 50 messages between these two users
-    messages = Message.objects.filter(
-        (Q(sender=request.user) & Q(receiver=target_user)) |
-        (Q(sender=target_user) & Q(receiver=request.user))
-    ).order_by('timestamp')[:50]
+    # 1. Fetch the newest page of messages between these two users (older pages load on scroll)
+    messages, has_more = chat.conversation_history(request.user.id, target_user.id)
 
-    # 2. Mark any unread messages FROM the other person TO me as "Read"
-    Message.objects.filter(sender=target_user, receiver=request.user, is_read=False).update(is_read=True)
+    # Read state is not written here: the page sends a mark_read frame over
+    # the websocket for the newest message it shows (see ChatConsumer)
 
     return render(request, 'departments/private_messages.html', {
         'target_user': target_user,
-        'chat_messages': messages  # Send the history to the template
+        'chat_messages': messages,  # Send the history to the template
+        'oldest_message_id': messages[0].id if messages else None,
+        'has_more_history': has_more,
+    })
+
+@login_required
+def chat_history(request, user_id):
+    """
+    Older messages of a private conversation as JSON, for infinite scroll.
+    ?before=<message id> returns the page of messages just older than it.
+    """
+    target_user = get_object_or_404(User, id=user_id)
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    messages, has_more = chat.conversation_history(request.user.id, target_user.id, before=before)
+    return JsonResponse({
+        'messages': [chat.message_to_dict(message) for message in messages],
+        'has_more': has_more,
+        'next_before': messages[0].id if messages else None,
+    })
+
+@login_required
+def chat_inbox(request):
+    """The user's conversations with last message and unread count, most recent first"""
+    conversations = chat.inbox(request.user.id)
+    return JsonResponse({
+        'conversations': [chat.conversation_to_dict(conversation, request.user.id) for conversation in conversations],
+    })
+
+@login_required
+def chat_search(request):
+    """
+    Full-text search over the user's own conversations, best match first.
+    ?q=<words>&page=<n>; JSON with the matching messages and the other participant.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page'}, status=400)
+
+    results, has_next = search.search_messages(request.user.id, query, page=page)
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'has_next': has_next,
+        'results': [
+            {
+                **chat.message_to_dict(message),
+                'content': chat.preview_text(message),
+                'other_user_id': message.receiver_id if message.sender_id == request.user.id else message.sender_id,
+                'other_username': (message.receiver if message.sender_id == request.user.id else message.sender).username,
+            }
+            for message in results
+        ],
+    })
+
+@login_required
+def chat_groups(request):
+    """The user's group rooms with unread counts, as JSON"""
+    return JsonResponse({
+        'groups': [
+            {
+                'id': membership.group_id,
+                'name': membership.group.name,
+                'kind': membership.group.kind,
+                'unread': membership.unread,
+                'last_read_id': membership.last_read_id,
+            }
+            for membership in groups.user_groups(request.user.id)
+        ]
+    })
+
+@login_required
+def group_history(request, group_id):
+    """A page of a group room's messages as JSON; ?before=<message id> for older ones"""
+    if not ChatGroupMember.objects.filter(group_id=group_id, user=request.user).exists():
+        return JsonResponse({'error': 'Not a member of this group'}, status=403)
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    messages, has_more = groups.group_history(group_id, before=before)
+    return JsonResponse({
+        'messages': [groups.group_message_to_dict(message) for message in messages],
+        'has_more': has_more,
+        'next_before': messages[0].id if messages else None,
     })
 
-@csrf_exempt
 @login_required
 def upload_chat_file(request):
     if request.method == 'POST' and (request.FILES.get('image') or request.FILES.get('file')):
         # Get the uploaded file
         uploaded_file = request.FILES.get('image') or request.FILES.get('file')
-        
-        # Generate a unique filename to avoid overwrites
-        import uuid
-        import os
-        file_extension = os.path.splitext(uploaded_file.name)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        
-        # Save it to a 'chat_uploads' folder in your media directory
-        file_path = f'chat_uploads/{unique_filename}'
-        saved_path = default_storage.save(file_path, uploaded_file)
-        file_url = default_storage.url(saved_path)
-        
+
+        # Stored under its content hash like chunked uploads (identical files kept once)
+        try:
+            upload = uploads.store_file(request.user, uploaded_file)
+        except uploads.UploadError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+
         # Return the URL so the JavaScript can send it as a message
-        return JsonResponse({
-            'url': file_url, 
-            'name': uploaded_file.name,
-            'type': 'image' if 'image' in request.FILES else 'file'
-        })
+        return JsonResponse(_upload_response(upload))
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
+def _upload_response(upload):
+    data = uploads.upload_to_dict(upload)
+    data['preview_url'] = reverse('chat_upload_preview', args=[upload.upload_id])
+    return data
+
+@login_required
+def start_chat_upload(request):
+    """
+    Begin a chunked upload: POST name and size, get back the upload_id and
+    chunk size. Chunks are then PUT to chat_upload_chunk in order.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    try:
+        upload = uploads.start_upload(request.user, request.POST.get('name', ''), int(request.POST.get('size', 0)))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid size'}, status=400)
+    except uploads.UploadError as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    return JsonResponse(_upload_response(upload), status=201)
+
+@login_required
+def chat_upload_chunk(request, upload_id):
+    """
+    GET: how much of the upload the server has (to resume after a dropped connection).
+    PUT with ?offset=<bytes received>: append the request body; the last chunk
+    completes the upload and the response then carries its url.
+    """
+    if request.method == 'GET':
+        upload = get_object_or_404(ChatUpload, upload_id=upload_id, owner=request.user)
+        return JsonResponse(_upload_response(upload))
+    if request.method != 'PUT':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    try:
+        offset = int(request.GET.get('offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid offset'}, status=400)
+    try:
+        # The body is streamed to disk from the request, never read whole
+        upload = uploads.append_chunk(upload_id, request.user, offset, request, length)
+    except uploads.UploadError as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    return JsonResponse(_upload_response(upload))
+
+@login_required
+def chat_upload_preview(request, upload_id):
+    """Small preview of an attachment: its thumbnail once made, the file itself until then"""
+    upload = get_object_or_404(ChatUpload, upload_id=upload_id, status='COMPLETE')
+    return redirect(upload.thumbnail.url if upload.thumbnail else upload.file.url)
+
 @login_required
 def chat_list(request):  # <--- Make sure this is 'chat_list'
-    # Get all users except the logged-in user
-    users = User.objects.exclude(id=request.user.id)
-    
-    # Get the status for each user
-    for user in users:
-        UserStatus.objects.get_or_create(user=user)
-        
+    # All other users with their unread counts in one query, and their live
+    # presence in one cache read; presence rows are created with the user
+    users = presence.with_presence(chat.chat_contacts(request.user.id))
     return render(request, 'departments/chat.html', {'users': users})
 @login_required
 def staff_chat_dashboard(request):